@@ -0,0 +1,11 @@
+"""Benchmarks for the Python NVGIF implementation.
+
+Run from the `python/` directory, e.g. `python -m benchmarks.rle`.
+
+- `benchmarks.rle`: the shared RLE codec against the loops it replaced.
+- `benchmarks.suite`: every version and compression mode on the synthetic
+  images of `benchmarks.corpus`, checked against a baseline recorded on
+  the same machine with `--record` (see its docstring).
+- `benchmarks.async_latency`: event-loop lag while jobs run blocking on the
+  loop versus through `nvgif_async.AsyncNVGIF`.
+"""
@@ -0,0 +1,78 @@
+"""Event-loop latency while NVGIF jobs run, blocking vs. through AsyncNVGIF.
+
+    python -m benchmarks.async_latency [--jobs 32] [--size 1024x768] [--workers 4]
+
+A ticker coroutine asks to wake up every `TICK` seconds and records how
+late it actually runs; that lag is what every other coroutine on the
+loop (e.g. request handlers) would see. The same batch of encode+decode
+jobs is run by calling `NVGIF` directly on the loop, then through
+`AsyncNVGIF` with a thread and with a process executor.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from nvgif import NVGIF
+from nvgif_async import AsyncNVGIF
+from benchmarks.corpus import make_image
+
+TICK = 0.005
+
+
+async def ticker(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - expected)
+
+
+async def blocking_job(img):
+    nv = NVGIF()
+    nv.decode_bytes(nv.encode_bytes(img, compression="rle"))
+
+
+async def async_job(anv, img):
+    await anv.decode_bytes(await anv.encode_bytes(img, compression="rle"))
+
+
+async def measure(label, jobs):
+    lags = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*jobs)
+    seconds = time.perf_counter() - start
+    stop.set()
+    await tick
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(f"{label:<16} {seconds:7.2f}s {len(lags_ms):6} ticks  p50 {statistics.median(lags_ms):7.1f}ms  "
+          f"p99 {p99:7.1f}ms  max {lags_ms[-1]:7.1f}ms")
+
+
+async def run(args):
+    width, height = (int(v) for v in args.size.split("x"))
+    img = make_image("screenshot", (width, height))
+    print(f"{args.jobs} encode+decode jobs of a {width}x{height} screenshot, tick {TICK * 1000:.0f}ms")
+
+    await measure("blocking", [blocking_job(img) for _ in range(args.jobs)])
+    for executor in ("thread", "process"):
+        async with AsyncNVGIF(executor, workers=args.workers) as anv:
+            await measure(f"async {executor}", [async_job(anv, img) for _ in range(args.jobs)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop latency under NVGIF load")
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--size", default="1024x768")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Deterministic synthetic images for the NVGIF benchmark suite.
+
+Every image is generated from a fixed seed, so a corpus is identical from
+run to run and results can be compared against a stored baseline.
+"""
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+KINDS = ("flat", "gradient", "noise", "screenshot", "photo")
+
+SIZES = {
+    "small": (256, 256),
+    "medium": (1024, 768),
+    "large": (1920, 1080),
+}
+
+_WORDS = ("file", "edit", "view", "image", "export", "layer", "open", "save", "NVGIF", "zoom", "color",
+          "settings", "help", "row", "pixel", "alpha", "decode", "encode", "window", "tools")
+
+
+def _flat(size, rnd):
+    return Image.new("RGB", size, (40, 120, 200))
+
+
+def _gradient(size, rnd):
+    w, h = size
+    horizontal = Image.linear_gradient("L").rotate(90).resize(size)
+    vertical = Image.linear_gradient("L").resize(size)
+    diagonal = Image.linear_gradient("L").rotate(45, expand=True).resize(size)
+    return Image.merge("RGB", (horizontal, vertical, diagonal))
+
+
+def _noise(size, rnd):
+    w, h = size
+    return Image.frombytes("RGB", size, rnd.randbytes(w * h * 3))
+
+
+def _screenshot(size, rnd):
+    # Flat UI chrome with solid panels, buttons and lines of text.
+    w, h = size
+    img = Image.new("RGB", size, (246, 246, 246))
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    draw.rectangle((0, 0, w, 28), fill=(52, 58, 70))
+    draw.text((10, 8), "NVGIF Viewer", fill=(255, 255, 255), font=font)
+    sidebar = w // 5
+    draw.rectangle((0, 28, sidebar, h), fill=(228, 230, 235))
+    for y in range(40, h, 22):
+        draw.text((12, y), rnd.choice(_WORDS).title(), fill=(40, 40, 40), font=font)
+    for y in range(44, h - 20, 18):
+        line = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randrange(3, 14)))
+        draw.text((sidebar + 16, y), line, fill=(20, 20, 20), font=font)
+    for _ in range(6):
+        x, y = rnd.randrange(sidebar, max(sidebar + 1, w - 90)), rnd.randrange(40, max(41, h - 30))
+        draw.rectangle((x, y, x + 80, y + 22), fill=rnd.choice(((0, 120, 215), (16, 124, 16), (200, 60, 40))))
+    return img
+
+
+def _photo(size, rnd):
+    # Smooth low-frequency colour fields with a little sensor noise on top.
+    w, h = size
+    coarse = (max(2, w // 48), max(2, h // 48))
+    base = Image.frombytes("RGB", coarse, rnd.randbytes(coarse[0] * coarse[1] * 3)).resize(size, Image.BICUBIC)
+    grain = _noise(size, rnd)
+    return Image.blend(base, grain, 0.06)
+
+
+_GENERATORS = {
+    "flat": _flat,
+    "gradient": _gradient,
+    "noise": _noise,
+    "screenshot": _screenshot,
+    "photo": _photo,
+}
+
+
+def make_image(kind, size, alpha=False, seed=0):
+    """Return an RGBA image of `kind` and `size`.
+
+    Without `alpha` the image is fully opaque. With it, an elliptical
+    cut-out with a soft edge is used as the alpha channel, like a sprite
+    or logo on a transparent background.
+    """
+    rnd = random.Random(f"{kind}-{size[0]}x{size[1]}-{seed}")
+    img = _GENERATORS[kind](size, rnd).convert("RGBA")
+    if alpha:
+        w, h = size
+        mask = Image.new("L", size, 0)
+        ImageDraw.Draw(mask).ellipse((w // 10, h // 10, w - w // 10, h - h // 10), fill=255)
+        edge = Image.radial_gradient("L").resize(size)
+        img.putalpha(Image.composite(mask, edge.point(lambda v: 255 - v), mask))
+    return img
+
+
+def iter_corpus(kinds=KINDS, sizes=tuple(SIZES), alphas=(False, True)):
+    """Yield `(name, image, alpha)` for every combination of kind, size name and alpha."""
+    for size_name in sizes:
+        for kind in kinds:
+            for alpha in alphas:
+                name = f"{kind}-{size_name}" + ("-alpha" if alpha else "")
+                yield name, make_image(kind, SIZES[size_name], alpha), alpha
@@ -0,0 +1,94 @@
+"""Micro-benchmark for nvgif_rle against the per-run loops it replaced.
+
+    python -m benchmarks.rle [--width 4096] [--height 64] [--repeat 3]
+"""
+import argparse
+import random
+import time
+
+import nvgif_rle
+
+
+def legacy_rle_encode(row, bpp):
+    # The loop NVGIFv2/v3/v4 used before nvgif_rle.
+    result = bytearray()
+    i = 0
+    while i < len(row):
+        unit = row[i:i+bpp]
+        count = 1
+        while (i + count * bpp < len(row)) and (count < 255) and (row[i + count * bpp:i + (count+1) * bpp] == unit):
+            count += 1
+        result.append(count)
+        result += unit
+        i += count * bpp
+    return result
+
+
+def legacy_rle_decode(data, bpp):
+    result = bytearray()
+    i = 0
+    while i < len(data):
+        count = data[i]
+        unit = data[i+1:i+1+bpp]
+        result.extend(unit * count)
+        i += 1 + bpp
+    return result
+
+
+def make_frame(width, height, bpp, mean_run, seed=0):
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(height):
+        row = bytearray()
+        while len(row) < width * bpp:
+            pixel = bytes(rnd.randrange(256) for _ in range(bpp))
+            row += pixel * max(1, int(rnd.expovariate(1 / mean_run)))
+        rows.append(bytes(row[:width * bpp]))
+    return rows
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared NVGIF RLE codec")
+    parser.add_argument("--width", type=int, default=4096)
+    parser.add_argument("--height", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    numpy = nvgif_rle.np
+    backends = [("numpy", numpy)] if numpy is not None else []
+    backends.append(("stdlib", None))
+
+    print(f"{'content':<10} {'bpp':>3} {'op':<7} {'legacy':>9} " + " ".join(f"{n:>9} {'x':>6}" for n, _ in backends))
+    for label, mean_run in (("noise", 1), ("photo", 3), ("ui", 40), ("flat", 4000)):
+        for bpp in (3, 4):
+            rows = make_frame(args.width, args.height, bpp, mean_run)
+            frame = b"".join(rows)
+            encoded = [bytes(legacy_rle_encode(r, bpp)) for r in rows]
+
+            legacy_enc = best_of(args.repeat, lambda: [legacy_rle_encode(r, bpp) for r in rows])
+            legacy_dec = best_of(args.repeat, lambda: [legacy_rle_decode(e, bpp) for e in encoded])
+            enc_cols, dec_cols = [], []
+            for _, backend in backends:
+                nvgif_rle.np = backend
+                assert nvgif_rle.rle_encode_rows(frame, args.width, args.height, bpp) == encoded
+                t = best_of(args.repeat, lambda: nvgif_rle.rle_encode_rows(frame, args.width, args.height, bpp))
+                enc_cols.append(f"{t * 1000:8.1f}ms {legacy_enc / t:5.1f}x")
+                t = best_of(args.repeat, lambda: [nvgif_rle.rle_decode(e, bpp) for e in encoded])
+                dec_cols.append(f"{t * 1000:8.1f}ms {legacy_dec / t:5.1f}x")
+            nvgif_rle.np = numpy
+
+            print(f"{label:<10} {bpp:>3} {'encode':<7} {legacy_enc * 1000:7.1f}ms " + " ".join(enc_cols))
+            print(f"{label:<10} {bpp:>3} {'decode':<7} {legacy_dec * 1000:7.1f}ms " + " ".join(dec_cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Encode/decode benchmark of every NVGIF version and compression mode on a synthetic corpus.
+
+    python -m benchmarks.suite [--sizes small,medium,large] [--kinds flat,noise,...]
+                               [--repeat 3] [--rounds 3] [--output results.json]
+                               [--baseline benchmarks/baseline.json] [--threshold 0.5]
+                               [--record]
+
+For each image of `benchmarks.corpus` and each version x mode it records
+encode and decode throughput (MB/s of raw pixels), the compression ratio
+and the peak Python heap use measured with `tracemalloc` (NumPy buffers
+are included, Pillow's image memory is not).
+
+Each timing is the best of at least `--repeat` runs and `MIN_SECONDS` of
+repetition, and the whole corpus is run `--rounds` times with the best
+throughput per case kept. Interleaving the rounds keeps a burst of load
+on the machine from slowing every sample of one case.
+
+Results are compared against the baseline file when it exists; the run
+exits with status 1 if any case's throughput drops by more than
+`--threshold` (a fraction) below the baseline. Throughput is absolute,
+so a baseline is only meaningful on the machine it was recorded on and
+none is kept in the repository. To check a change, record a baseline on
+the commit it is based on and then run the suite on the change:
+
+    git checkout main && python -m benchmarks.suite --record
+    git checkout - && python -m benchmarks.suite
+
+Even best-of timings vary by up to 40% between runs on a busy or
+virtualised machine, so the default threshold is 0.5; lower it only on
+a quiet machine.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import PIL
+
+import nvgif_rle
+from nvgif import NVGIF
+from nvgif_buffer import BufferReader
+from benchmarks.corpus import KINDS, SIZES, iter_corpus
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Compression modes measured per version; v1 has none to choose from.
+# A mode can also be `(compression, options)` to measure a variant with
+# extra `NVGIF.encode` options; `workers` is passed to the decoder too.
+MODES = {
+    1: (None,),
+    2: ("none", "rle"),
+    3: ("none", "rle"),
+    4: (
+        "none",
+        "rle",
+        "zlib",
+        "rlezlib",
+        # Palette storage is opt-in; images of over 256 colours fall back to RGB/RGBA.
+        ("rle", {"palette": None}),
+        ("rlezlib", {"palette": None}),
+    ),
+    5: (
+        "none",
+        "rle",
+        "zlib",
+        "rlezlib",
+        ("rlezlib", {"tile_size": (64, 64)}),
+        ("rlezlib", {"tile_size": (1024, 1024)}),
+        ("rlezlib", {"workers": 1}),
+        ("rlezlib", {"workers": 4}),
+    ),
+}
+
+# Result fields compared against the baseline.
+THROUGHPUT_FIELDS = ("encode_mb_s", "decode_mb_s")
+
+
+# Each timing keeps repeating for at least this long, so cases that take a
+# few milliseconds get enough samples for their best time to be stable.
+MIN_SECONDS = 0.2
+
+
+def best_of(repeat, fn, min_seconds=MIN_SECONDS):
+    best = float("inf")
+    runs = 0
+    started = time.perf_counter()
+    while runs < repeat or time.perf_counter() - started < min_seconds:
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        runs += 1
+    return best
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def case_key(result):
+    key = f"{result['image']}/v{result['version']}/{result['compression']}"
+    return f"{key}/{result['variant']}" if result.get("variant") else key
+
+
+def variant_name(extra):
+    """Short label of a mode's extra options, such as `tile=64x64` or `workers=1`."""
+    parts = []
+    for name, value in sorted(extra.items()):
+        if name == "tile_size":
+            parts.append(f"tile={value[0]}x{value[1]}")
+        elif name == "palette" and value is None:
+            parts.append("palette=auto")
+        else:
+            parts.append(f"{name}={value}")
+    return ",".join(parts)
+
+
+def run_case(nv, name, img, alpha, version, mode, repeat):
+    compression, extra = mode if isinstance(mode, tuple) else (mode, {})
+    # v1 and v2 have no alpha channel; they always store RGB.
+    alpha = alpha and version >= 3
+    options = {"version": version, "compression": compression, **extra}
+    if version >= 3:
+        options["alpha"] = 1 if alpha else 0
+
+    def encode():
+        out = io.BytesIO()
+        nv.encode(img, out, **options)
+        return out.getvalue()
+
+    data = encode()
+    if "workers" in extra:
+        def decode():
+            return nv.versions[version].decode(BufferReader(data), workers=extra["workers"])
+    else:
+        def decode():
+            return nv.decode_bytes(data)
+    raw_bytes = img.width * img.height * (4 if alpha else 3)
+    encode_s = best_of(repeat, encode)
+    decode_s = best_of(repeat, decode)
+    return {
+        "image": name,
+        "width": img.width,
+        "height": img.height,
+        "alpha": alpha,
+        "version": version,
+        "compression": compression or "none",
+        "variant": variant_name(extra),
+        "raw_bytes": raw_bytes,
+        "encoded_bytes": len(data),
+        "ratio": raw_bytes / len(data),
+        "encode_mb_s": raw_bytes / encode_s / 1e6,
+        "decode_mb_s": raw_bytes / decode_s / 1e6,
+        "encode_peak_mb": peak_memory(encode) / 1e6,
+        "decode_peak_mb": peak_memory(decode) / 1e6,
+    }
+
+
+def run_suite(kinds=KINDS, sizes=tuple(SIZES), repeat=3, rounds=1, progress=None):
+    """Run every version x mode on the corpus and return the list of result dicts.
+
+    With several `rounds` each case keeps its best throughput; `progress`
+    is called with every case's result of the last round.
+    """
+    nv = NVGIF()
+    corpus = list(iter_corpus(kinds, sizes))
+    best = {}
+    for round_no in range(rounds):
+        for name, img, alpha in corpus:
+            for version, modes in MODES.items():
+                if alpha and version < 3:
+                    # Without an alpha channel these are the same as the opaque image's cases.
+                    continue
+                for mode in modes:
+                    result = run_case(nv, name, img, alpha, version, mode, repeat)
+                    key = case_key(result)
+                    if key in best:
+                        for field in THROUGHPUT_FIELDS:
+                            result[field] = max(result[field], best[key][field])
+                    best[key] = result
+                    if progress and round_no == rounds - 1:
+                        progress(result)
+    return list(best.values())
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "numpy": nvgif_rle.np.__version__ if nvgif_rle.np is not None else None,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return `(key, field, baseline, current)` for every throughput that fell more than `threshold` below baseline."""
+    previous = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if before is None:
+            continue
+        for field in THROUGHPUT_FIELDS:
+            if result[field] < before[field] * (1 - threshold):
+                regressions.append((case_key(result), field, before[field], result[field]))
+    return regressions
+
+
+def print_result(r):
+    case = f"{r['compression']} {r['variant']}".strip()
+    print(f"{r['image']:<24} v{r['version']} {case:<26} {r['ratio']:8.2f}x "
+          f"{r['encode_mb_s']:9.1f} {r['decode_mb_s']:9.1f} {r['encode_peak_mb']:9.1f} {r['decode_peak_mb']:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NVGIF versions and compression modes on a synthetic corpus")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"Comma-separated sizes from {', '.join(SIZES)}")
+    parser.add_argument("--kinds", default=",".join(KINDS), help=f"Comma-separated image kinds from {', '.join(KINDS)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the corpus; the best per case is kept (default: 3)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline JSON to compare against (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Allowed throughput drop as a fraction (default: 0.5)")
+    parser.add_argument("--record", "--update-baseline", dest="record", action="store_true",
+                        help="Write the results to --baseline instead of comparing")
+    args = parser.parse_args()
+
+    print(f"{'image':<24} {'case':<29} {'ratio':>9} {'enc MB/s':>9} {'dec MB/s':>9} {'enc MB':>9} {'dec MB':>9}")
+    results = run_suite(args.kinds.split(","), args.sizes.split(","), args.repeat, args.rounds, print_result)
+    report = {"environment": environment(), "results": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    if args.record:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --record to record one")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for key, field, before, now in regressions:
+        print(f"✗ {key} {field}: {before:.1f} → {now:.1f} MB/s ({now / before - 1:+.0%})")
+    if regressions:
+        sys.exit(1)
+    print(f"✓ No throughput regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,67 +1,459 @@
+import io
+import os
 from nvgif_v1 import NVGIFv1
 from nvgif_v2 import NVGIFv2
 from nvgif_v3 import NVGIFv3
 from nvgif_v4 import NVGIFv4
+from nvgif_v5 import NVGIFv5
+from nvgif_auto import pick_compression
+from nvgif_buffer import BufferReader, input_file, open_buffer, output_file, peek_header
+from nvgif_pixels import draft_scale, scale_step, scaled_size
+from nvgif_rle import rle_encode_rows
+from nvgif_stats import timed
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only `decode_array` needs it
+    np = None
+
+# File extensions NVGIF files go by: `.nvg`, or `.nvg1` to `.nvg5` for a version.
+NVG_SUFFIXES = (".nvg", ".nvg1", ".nvg2", ".nvg3", ".nvg4", ".nvg5")
+
+class NVGIFProbe:
+    """Header metadata of one NVGIF, as returned by `NVGIF.probe`."""
+
+    __slots__ = ("path", "version", "width", "height", "compression", "alpha", "indexed", "file_size",
+                 "payload_size", "palette")
+
+    def __init__(self, path, version, width, height, compression, alpha, indexed, file_size, payload_size,
+                 palette=0):
+        self.path = path
+        self.version = version
+        self.width = width
+        self.height = height
+        self.compression = compression
+        self.alpha = alpha
+        self.indexed = indexed
+        self.file_size = file_size
+        self.payload_size = payload_size
+        # Colours in the palette table, or 0 for RGB/RGBA pixels.
+        self.palette = palette
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return (f"NVGIFProbe({self.path!r}, v{self.version}, {self.width}x{self.height}, {self.compression}, "
+                f"alpha={self.alpha}, payload={self.payload_size})")
+
+
+# Rows converted or RLE-encoded together when transcoding.
+TRANSCODE_BATCH_ROWS = 64
+
+
+def _row_form(compression, alpha, palette):
+    # How a v2-v4 file stores its rows: RLE groups or packed pixels, and the
+    # bytes per pixel. Every version uses 1 and 3 for its RLE modes.
+    rle = compression in (NVGIFv4.COMPRESSION_RLE, NVGIFv4.COMPRESSION_RLE_ZLIB)
+    return rle, 1 if palette else 4 if alpha & NVGIFv4.ALPHA_ENABLED else 3
+
+
+def _batches(rows, size=TRANSCODE_BATCH_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _convert_rows(rows, width, src_bpp, bpp):
+    # Add an opaque alpha channel to, or drop it from, packed rows.
+    if src_bpp == bpp:
+        yield from rows
+        return
+    src_mode, mode = ("RGBA" if src_bpp == 4 else "RGB"), ("RGBA" if bpp == 4 else "RGB")
+    for batch in _batches(rows):
+        data = Image.frombytes(src_mode, (width, len(batch)), b"".join(batch)).convert(mode).tobytes()
+        row_size = width * bpp
+        for y in range(len(batch)):
+            yield data[y * row_size:(y + 1) * row_size]
+
+
+def _rle_rows(rows, width, bpp):
+    for batch in _batches(rows):
+        yield from rle_encode_rows(b"".join(batch), width, len(batch), bpp)
+
 
 class NVGIF:
     DEFAULT_COMPRESSIONS = {
         1: "none",
         2: "rle",
         3: "rle",
-        4: "rlezlib"
+        4: "rlezlib",
+        5: "rlezlib",
+    }
+
+    # Bytes before the first row, per version.
+    HEADER_SIZES = {1: 8, 2: 9, 3: 10, 4: 11, 5: NVGIFv5.HEADER_SIZE}
+
+    # Map string compression values to version-specific constants
+    COMPRESSIONS = {
+        2: {"rle": NVGIFv2.COMPRESSION_RLE, "none": NVGIFv2.COMPRESSION_NONE},
+        3: {"rle": NVGIFv3.COMPRESSION_RLE, "none": NVGIFv3.COMPRESSION_NONE},
+        4: {
+            "rle": NVGIFv4.COMPRESSION_RLE,
+            "none": NVGIFv4.COMPRESSION_NONE,
+            "zlib": NVGIFv4.COMPRESSION_ZLIB,
+            "rlezlib": NVGIFv4.COMPRESSION_RLE_ZLIB,
+        },
+        5: {
+            "rle": NVGIFv5.COMPRESSION_RLE,
+            "none": NVGIFv5.COMPRESSION_NONE,
+            "zlib": NVGIFv5.COMPRESSION_ZLIB,
+            "rlezlib": NVGIFv5.COMPRESSION_RLE_ZLIB,
+        },
     }
     
-    def __init__(self):
+    def __init__(self, cache=None):
+        # Optional `nvgif_cache.DecodeCache` consulted by `decode` for paths.
+        self.cache = cache
         self.versions = {
             1: NVGIFv1(),
             2: NVGIFv2(),
             3: NVGIFv3(),
             4: NVGIFv4(),
+            5: NVGIFv5(),
         }
 
-    def encode(self, image, out_path, version=4, compression=None, alpha=0):
+    def encode(self, image, out_path, version=4, compression=None, alpha=0, workers=None,
+               level=NVGIFv4.DEFAULT_LEVEL, policy="smallest", index_interval=None, stats=None, tile_size=None,
+               palette=False):
         if version not in self.versions:
             raise ValueError(f"Unsupported NVGIF version: {version}")
         
         if version == 1:
-            self.versions[version].encode(image, out_path)
-            return
+            self.versions[version].encode(image, out_path, stats=stats)
+            return "none"
             
         if compression is None:
             compression = self.DEFAULT_COMPRESSIONS[version]
-        
-        # Map string compression values to version-specific constants
-        compression_map = {
-            2: {"rle": NVGIFv2.COMPRESSION_RLE, "none": NVGIFv2.COMPRESSION_NONE},
-            3: {"rle": NVGIFv3.COMPRESSION_RLE, "none": NVGIFv3.COMPRESSION_NONE},
-            4: {
-                "rle": NVGIFv4.COMPRESSION_RLE,
-                "none": NVGIFv4.COMPRESSION_NONE,
-                "zlib": NVGIFv4.COMPRESSION_ZLIB,
-                "rlezlib": NVGIFv4.COMPRESSION_RLE_ZLIB,
-            },
-        }
+
+        if compression == "auto":
+            if not isinstance(image, Image.Image):
+                with timed(stats, "load"):
+                    image = Image.open(image).convert("RGBA")
+            with timed(stats, "auto"):
+                compression = pick_compression(image, version, alpha, policy, level,
+                                               palette=palette if version == 4 else False).compression
         
         if isinstance(compression, str):
             try:
-                compression = compression_map[version][compression]
+                compression = self.COMPRESSIONS[version][compression]
             except (KeyError, TypeError):
                 raise ValueError(f"Unsupported compression '{compression}' for NVGIFv{version}")
+        name = self.compression_name(version, compression)
                 
-        self.versions[version].encode(image, out_path, compression=compression, alpha=alpha)
+        if version == 2:
+            self.versions[version].encode(image, out_path, compression=compression, workers=workers, stats=stats)
+        elif version == 3:
+            self.versions[version].encode(image, out_path, compression=compression, alpha=alpha, workers=workers,
+                                          stats=stats)
+        elif version == 4:
+            self.versions[version].encode(image, out_path, compression=compression, alpha=alpha, workers=workers, level=level,
+                                          index_interval=index_interval, stats=stats, palette=palette)
+        else:
+            self.versions[version].encode(image, out_path, compression=compression, alpha=alpha, workers=workers, level=level,
+                                          tile_size=tile_size, stats=stats)
+        return name
+
+    def encode_bytes(self, image, version=4, compression=None, alpha=0, workers=None,
+                     level=NVGIFv4.DEFAULT_LEVEL, policy="smallest", index_interval=None, stats=None, tile_size=None,
+                     palette=False):
+        """Encode `image` like `encode` and return the NVGIF file as bytes."""
+        out = io.BytesIO()
+        self.encode(image, out, version, compression, alpha, workers, level, policy, index_interval, stats, tile_size,
+                    palette)
+        return out.getvalue()
 
-    def decode(self, in_path, out_path=None): 
-        with open(in_path, "rb") as f:
-            header = f.read(4)
-            if not header.startswith(b"NVG"):
-                raise ValueError("Not a valid NVGIF file")
-            version = header[3]
+    def transcode(self, src, dst, version=4, compression=None, alpha=None, level=NVGIFv4.DEFAULT_LEVEL,
+                  index_interval=None, stats=None, tile_size=None):
+        """Convert the NVGIF at `src` to `version` and `compression` at `dst` without building an image.
 
+        Between v2, v3 and v4, rows stored the same way in both files (RLE
+        groups, or packed pixels, of the same size) are copied unchanged, so
+        only the header, length prefixes and zlib wrapper are rewritten.
+        Other rows are decoded and re-encoded a batch at a time. `alpha` None
+        keeps the source's alpha channel, and v4 palette files stay palette
+        files in v4. v1 and v5 targets are decoded and encoded in full.
+        Returns the name of the compression used.
+        """
         if version not in self.versions:
             raise ValueError(f"Unsupported NVGIF version: {version}")
+        if not hasattr(src, "read") and not hasattr(dst, "write") and not isinstance(src, BufferReader) \
+                and os.path.exists(dst) and os.path.samefile(src, dst):
+            raise ValueError("Cannot transcode a file onto itself")
 
-        decoder = self.versions[version]
-        if version == 4:
-            return decoder.decode(in_path, out_path or decoder.RETURN_IMAGE)
-        else:
-            return decoder.decode(in_path)
\ No newline at end of file
+        with open_buffer(src, stats) as source:
+            start = source.tell()
+            decoder = self._decoder_for(source)
+            src_compression, src_alpha = self._header_fields(decoder, source)
+            src_bpp = 4 if src_alpha & NVGIFv4.ALPHA_ENABLED else 3
+            if alpha is None:
+                alpha = src_alpha & NVGIFv4.ALPHA_ENABLED
+            if version < 3:
+                alpha = 0
+
+            if version in (1, 5):
+                source.seek(start)
+                image = decoder.decode(source, decoder.RETURN_IMAGE, stats=stats)
+                return self.encode(image, dst, version, compression, alpha, level=level, stats=stats,
+                                   tile_size=tile_size)
+
+            if compression is None:
+                compression = self.DEFAULT_COMPRESSIONS[version]
+            if isinstance(compression, str):
+                try:
+                    compression = self.COMPRESSIONS[version][compression]
+                except KeyError:
+                    raise ValueError(f"Unsupported compression '{compression}' for NVGIFv{version}")
+            name = self.compression_name(version, compression)
+
+            # Palette indices can be kept only by v4, with entries of the same size.
+            src_palette = getattr(decoder, "palette", None)
+            palette = src_palette if version == 4 and alpha == src_alpha & NVGIFv4.ALPHA_ENABLED else None
+            rle, bpp = _row_form(compression, alpha, palette)
+            width = decoder.width
+            if decoder.VERSION in (2, 3, 4) and _row_form(src_compression, src_alpha, src_palette) == (rle, bpp):
+                copied = True
+                if decoder.VERSION == 4:
+                    rows = decoder._iter_encoded_rows(source, src_compression, src_alpha)
+                else:
+                    rows = decoder._iter_encoded_rows(source)
+            else:
+                copied = False
+                if palette is not None:
+                    rows = decoder._iter_rows(source, src_compression, src_alpha)
+                else:
+                    source.seek(start)
+                    rows = _convert_rows(decoder.iter_rows(source), width, src_bpp, bpp)
+
+            target = type(self.versions[version])()
+            target.width, target.height = width, decoder.height
+            if version == 4:
+                with target.open(dst, width, decoder.height, compression, alpha, level, index_interval, stats,
+                                 palette) as writer:
+                    if copied:
+                        writer.write_encoded_rows(rows)
+                    else:
+                        writer.write_rows(rows)
+                return name
+
+            if rle and not copied:
+                rows = _rle_rows(rows, width, bpp)
+            with output_file(dst) as f, timed(stats, "write"):
+                if version == 3:
+                    target._write(f, rows, compression, alpha)
+                else:
+                    target._write(f, rows, compression)
+            return name
+
+    @classmethod
+    def compression_name(cls, version, compression):
+        """Return the string name ("none", "rle", ...) of a version's compression constant."""
+        for name, value in cls.COMPRESSIONS.get(version, {}).items():
+            if value == compression:
+                return name
+        raise ValueError(f"Unsupported compression {compression!r} for NVGIFv{version}")
+
+    def _decoder_for(self, f):
+        # Sniffs the version from the open source `f` without consuming it,
+        # so the version decoder reads the same buffer from the start. The
+        # decoder is a fresh one, since decoders keep per-file state (size,
+        # flags, palette) and one NVGIF may be shared by several threads.
+        header = peek_header(f, 4)
+        if len(header) < 4 or not header.startswith(b"NVG"):
+            raise ValueError("Not a valid NVGIF file")
+        version = header[3]
+
+        if version not in self.versions:
+            raise ValueError(f"Unsupported NVGIF version: {version}")
+
+        return type(self.versions[version])()
+
+    @staticmethod
+    def _header_fields(decoder, f):
+        # Each version's `_read_header` returns a different shape; normalize
+        # it to (compression, alpha). v1 has neither, v2 has no alpha.
+        if decoder.VERSION == 1:
+            decoder._read_header(f)
+            return 0, 0
+        if decoder.VERSION == 2:
+            return decoder._read_header(f), 0
+        return decoder._read_header(f)
+
+    def probe(self, in_path):
+        """Read the header of the NVGIF at `in_path` without decoding it; returns an `NVGIFProbe`.
+
+        Only the header (with the palette table of palette v4 files) is read, plus the row index footer of indexed v4
+        files so that `payload_size` excludes it. `in_path` may be a path or
+        a seekable binary file object. Safe to call from several threads.
+        """
+        with input_file(in_path) as f:
+            start = f.tell()
+            decoder = self._decoder_for(f)
+            compression, alpha = self._header_fields(decoder, f)
+            header_size = f.tell() - start
+            if header_size < self.HEADER_SIZES[decoder.VERSION]:
+                raise ValueError("Truncated NVGIF header")
+            file_size = f.seek(0, os.SEEK_END) - start
+
+            palette = getattr(decoder, "palette", None)
+            footer_size = 0
+            indexed = bool(getattr(decoder, "flags", 0) & NVGIFv4.FLAG_ROW_INDEX)
+            if indexed:
+                _, offsets = decoder._read_index(f)
+                footer_size = 8 * len(offsets) + 10
+
+        path = getattr(in_path, "name", None) if hasattr(in_path, "read") else os.fspath(in_path)
+        return NVGIFProbe(
+            path,
+            decoder.VERSION,
+            decoder.width,
+            decoder.height,
+            "none" if decoder.VERSION == 1 else self.compression_name(decoder.VERSION, compression),
+            bool(alpha & NVGIFv4.ALPHA_ENABLED),
+            indexed,
+            file_size,
+            file_size - header_size - footer_size,
+            len(palette) // (4 if alpha & NVGIFv4.ALPHA_ENABLED else 3) if palette else 0,
+        )
+
+    def iter_rows(self, in_path, scale=None):
+        """Yield the decoded rows of the NVGIF at `in_path` one at a time, for any version.
+
+        `in_path` may be a path or a readable binary file object; with a
+        `scale` below 1 (see `decode`) it must be seekable unless the
+        payload is zlib-compressed.
+        """
+        with input_file(in_path) as f:
+            yield from self._decoder_for(f).iter_rows(f, scale)
+
+    def decode_region(self, in_path, box):
+        """Decode only the `(left, upper, right, lower)` box of the NVGIF at `in_path`.
+
+        v4 files seek using their row index when they have one and v5 files
+        decode only the tiles it overlaps; other versions stream rows from
+        the top and stop after `lower`.
+        """
+        with open_buffer(in_path) as source:
+            decoder = self._decoder_for(source)
+            if hasattr(decoder, "decode_region"):
+                return decoder.decode_region(source, box)
+
+            left, upper, right, lower = box
+            start = source.tell()
+            _, alpha = self._header_fields(decoder, source)
+            if not (0 <= left <= right <= decoder.width and 0 <= upper <= lower <= decoder.height):
+                raise ValueError(f"Region {box} is outside the {decoder.width}x{decoder.height} image")
+            source.seek(start)
+            bpp = 4 if alpha & NVGIFv4.ALPHA_ENABLED else 3
+            pixels = bytearray()
+            rows = decoder.iter_rows(source)
+            try:
+                for y, row in enumerate(rows):
+                    if y >= lower:
+                        break
+                    if y >= upper:
+                        pixels += row[left * bpp:right * bpp]
+            finally:
+                rows.close()
+
+        mode = "RGBA" if bpp == 4 else "RGB"
+        return Image.frombytes(mode, (right - left, lower - upper), bytes(pixels)).convert("RGBA")
+
+    def decode(self, in_path, out_path=None, stats=None, mode=None, scale=None, draft=None):
+        """Decode the NVGIF at `in_path` (a path or readable binary file object).
+
+        Returns a `PIL.Image.Image`, or saves it to `out_path` when given.
+        `mode` converts the image to that Pillow mode; palette v4 files
+        decoded with `mode="P"` keep their own palette and indices. Pass a
+        `nvgif_stats.Stats` as `stats` to record per-stage timings.
+
+        `scale` (1/2, 1/4, 1/8 or any 1/N) decodes a reduced image from
+        every Nth row and column, skipping the other rows. `draft=(w, h)`
+        picks the smallest of 1/8, 1/4, 1/2 and 1 that keeps the image at
+        least that size, for thumbnails.
+
+        With a `cache`, images decoded from a path are looked up and stored
+        there; file objects, `out_path` and `stats` always decode afresh.
+        """
+        if scale is not None and draft is not None:
+            raise ValueError("Pass either scale or draft, not both")
+        cache = self.cache
+        if cache is None or out_path or stats is not None or hasattr(in_path, "read") \
+                or isinstance(in_path, BufferReader):
+            return self._decode(in_path, out_path, stats, mode, scale, draft)
+
+        key = cache.key(in_path, mode, scale, draft)
+        image = cache.get(key)
+        if image is None:
+            image = self._decode(in_path, None, None, mode, scale, draft)
+            cache.put(key, image)
+        return image
+
+    def _decode(self, in_path, out_path, stats, mode, scale, draft):
+        with open_buffer(in_path, stats) as source:
+            decoder = self._decoder_for(source)
+            if draft is not None:
+                start = source.tell()
+                self._header_fields(decoder, source)
+                scale = draft_scale(draft, decoder.width, decoder.height)
+                source.seek(start)
+            if mode is None:
+                return decoder.decode(source, out_path or decoder.RETURN_IMAGE, stats=stats, scale=scale)
+
+            options = {"palette": True} if mode == "P" and decoder.VERSION == 4 else {}
+            image = decoder.decode(source, decoder.RETURN_IMAGE, stats=stats, scale=scale, **options)
+            if image.mode != mode:
+                with timed(stats, "convert"):
+                    image = image.convert(mode)
+            if not out_path:
+                return image
+            with timed(stats, "save"):
+                image.save(out_path)
+
+    def decode_into(self, in_path, out, scale=None, stats=None):
+        """Decode the NVGIF at `in_path` straight into the writable buffer `out`, without a PIL image.
+
+        `out` holds the pixels in the file's own channels: a bytearray or
+        memoryview of `height * width * channels` bytes, or a C-contiguous
+        uint8 array of shape `(height, width, channels)`, where channels is
+        4 for files with alpha and 3 otherwise (`scale` reduces height and
+        width). Raises ValueError if `out` does not fit. Returns `out`.
+        """
+        with open_buffer(in_path) as source:
+            return self._decoder_for    (source).decode_into(source, out, scale=scale, stats=stats)
+
+    def decode_array(self, in_path, scale=None, stats=None):
+        """Decode the NVGIF at `in_path` into a new `(height, width, channels)` uint8 NumPy array.
+
+        The array is the only full-frame allocation; see `decode_into`.
+        """
+        if np is None:
+            raise ImportError("decode_array needs NumPy")
+        with open_buffer(in_path) as source:
+            start = source.tell()
+            decoder = self._decoder_for(source)
+            _, alpha = self._header_fields(decoder, source)
+            source.seek(start)
+            width, height = scaled_size(decoder.width, decoder.height, scale_step(scale))
+            out = np.empty((height, width, 4 if alpha & NVGIFv4.ALPHA_ENABLED else 3), dtype=np.uint8)
+            return decoder.decode_into(source, out, scale=scale, stats=stats)
+
+    def decode_bytes(self, buf, out_path=None, stats=None, mode=None, scale=None, draft=None):
+        """Decode an NVGIF held in the bytes-like `buf`; see `decode`."""
+        return self.decode(BufferReader(buf), out_path, stats, mode, scale, draft)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from nvgif import NVGIF
+
+# One NVGIF per worker thread (or process): the version decoders keep the
+# width and height of the file they are working on.
+_local = threading.local()
+
+
+def _worker_nvgif():
+    nv = getattr(_local, "nvgif", None)
+    if nv is None:
+        nv = _local.nvgif = NVGIF()
+    return nv
+
+
+def _call(method, args, kwargs):
+    return getattr(_worker_nvgif(), method)(*args, **kwargs)
+
+
+class AsyncNVGIF:
+    """asyncio front end for `NVGIF`.
+
+    Every call runs in an executor, including the file I/O, so the event
+    loop is never blocked by a conversion. `executor` is `"thread"`
+    (default), `"process"` or any `concurrent.futures.Executor`; pools
+    created here use `workers` workers and are shut down by `close`.
+
+    At most `max_in_flight` jobs (default: `workers`) are submitted at a
+    time; further calls wait on a semaphore, so a burst of requests
+    cannot queue up unbounded images in memory. Cancelling a call that is
+    still waiting or queued drops it. A job that has already started runs
+    to completion in its worker and keeps its slot until it does.
+
+    Keyword arguments are passed on to `NVGIF`. A `stats=` object is only
+    filled in with a thread executor; with processes the worker's copy is
+    discarded.
+    """
+
+    def __init__(self, executor="thread", workers=None, max_in_flight=None):
+        workers = workers or os.cpu_count() or 1
+        if isinstance(executor, Executor):
+            self._executor = executor
+            self._owns_executor = False
+        elif executor == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nvgif")
+            self._owns_executor = True
+        elif executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._owns_executor = True
+        else:
+            raise ValueError(f"Unsupported executor: {executor!r}")
+        self._processes = isinstance(self._executor, ProcessPoolExecutor)
+        self._semaphore = asyncio.Semaphore(max_in_flight or workers)
+
+    async def _submit(self, method, *args, **kwargs):
+        await self._semaphore.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            job = self._executor.submit(_call, method, args, kwargs)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # The slot is freed when the job itself finishes (or is cancelled
+        # before starting), not when the awaiting task gives up on it.
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._semaphore.release))
+        return await asyncio.wrap_future(job)
+
+    async def encode(self, image, out_path, **kwargs):
+        """Await `NVGIF.encode(image, out_path, ...)`; returns the compression name used."""
+        return await self._submit("encode", image, out_path, **kwargs)
+
+    async def encode_bytes(self, image, **kwargs):
+        """Await `NVGIF.encode_bytes(image, ...)`; returns the encoded file as bytes."""
+        return await self._submit("encode_bytes", image, **kwargs)
+
+    async def decode(self, in_path, out_path=None, **kwargs):
+        """Await `NVGIF.decode(in_path, out_path)`; returns the image if `out_path` is not given."""
+        return await self._submit("decode", in_path, out_path, **kwargs)
+
+    async def decode_bytes(self, buf, out_path=None, **kwargs):
+        """Await `NVGIF.decode_bytes(buf, out_path)`."""
+        if self._processes and not isinstance(buf, bytes):
+            # Buffers such as memoryviews cannot be pickled to a worker process.
+            buf = bytes(buf)
+        return await self._submit("decode_bytes", buf, out_path, **kwargs)
+
+    async def probe(self, in_path):
+        """Await `NVGIF.probe(in_path)`."""
+        return await self._submit("probe", in_path)
+
+    def close(self, wait=True):
+        """Shut down the executor if this object created it."""
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,156 @@
+import time
+import zlib
+
+from nvgif_pixels import palette_buffer, pixel_buffer
+from nvgif_rle import rle_encode_rows
+
+# Compression modes `pick_compression` chooses between, per version.
+CANDIDATES = {
+    2: ("none", "rle"),
+    3: ("none", "rle"),
+    4: ("none", "rle", "zlib", "rlezlib"),
+    5: ("none", "rle", "zlib", "rlezlib"),
+}
+
+POLICIES = ("smallest", "fastest")
+
+# Rows per sampled band; whole bands keep some of the vertical redundancy
+# zlib would see in the full image.
+BAND_ROWS = 8
+
+
+class Budget:
+    """An `auto` policy: the smallest mode that fits within the given limits.
+
+    `max_bytes` caps the estimated payload size and `max_seconds` the
+    estimated encode time. If no mode fits, the fastest one is used.
+    """
+
+    __slots__ = ("max_bytes", "max_seconds")
+
+    def __init__(self, max_bytes=None, max_seconds=None):
+        if max_bytes is None and max_seconds is None:
+            raise ValueError("Budget needs max_bytes and/or max_seconds")
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+    def allows(self, estimate):
+        return ((self.max_bytes is None or estimate.size <= self.max_bytes)
+                and (self.max_seconds is None or estimate.seconds <= self.max_seconds))
+
+
+class Estimate:
+    """Projected payload size and encode time of one compression mode."""
+
+    __slots__ = ("compression", "size", "seconds")
+
+    def __init__(self, compression, size, seconds):
+        self.compression = compression
+        self.size = size
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"Estimate({self.compression!r}, size={self.size}, seconds={self.seconds:.4f})"
+
+
+class AutoChoice:
+    """The mode `pick_compression` chose, with the estimates it compared."""
+
+    __slots__ = ("compression", "estimates")
+
+    def __init__(self, compression, estimates):
+        self.compression = compression
+        self.estimates = estimates
+
+    def __repr__(self):
+        return f"AutoChoice({self.compression!r}, estimates={self.estimates!r})"
+
+
+def _band_tops(height, sample_rows):
+    bands = max(1, sample_rows // BAND_ROWS)
+    if bands == 1:
+        return [(height - BAND_ROWS) // 2]
+    return [i * (height - BAND_ROWS) // (bands - 1) for i in range(bands)]
+
+
+def _sample(img, bpp, sample_rows):
+    width, height = img.size
+    if height <= sample_rows:
+        return pixel_buffer(img, bpp), height
+    tops = _band_tops(height, sample_rows)
+    parts = [pixel_buffer(img.crop((0, top, width, top + BAND_ROWS)), bpp) for top in tops]
+    return b"".join(parts), len(tops) * BAND_ROWS
+
+
+def _sample_indices(indices, width, height, sample_rows):
+    # The same bands as `_sample`, cut from the palette indices of the
+    # whole image.
+    if height <= sample_rows:
+        return indices, height
+    tops = _band_tops(height, sample_rows)
+    parts = [indices[top * width:(top + BAND_ROWS) * width] for top in tops]
+    return b"".join(parts), len(tops) * BAND_ROWS
+
+
+def _encode_sample(buf, width, rows, bpp, compression, level):
+    start = time.perf_counter()
+    if compression == "zlib":
+        payload = buf
+    else:
+        if compression == "none":
+            row_len = width * bpp
+            encoded = [buf[y * row_len:(y + 1) * row_len] for y in range(rows)]
+        else:
+            encoded = rle_encode_rows(buf, width, rows, bpp)
+        payload = bytearray()
+        for row in encoded:
+            payload += len(row).to_bytes(2, "big")
+            payload += row
+    if compression in ("zlib", "rlezlib"):
+        payload = zlib.compress(payload, level)
+    return len(payload), time.perf_counter() - start
+
+
+def pick_compression(img, version=4, alpha=0, policy="smallest", level=9, sample_rows=32, palette=False):
+    """Estimate every compression mode of `version` on sampled rows of `img` and pick one.
+
+    `policy` is "smallest", "fastest" or a `Budget`. Sizes and times are
+    measured on about `sample_rows` rows and scaled to the full height.
+    For v4, the rows are sampled as palette indices when the encoder would
+    store a palette, following the same (opt-in) `palette` argument as
+    `NVGIFv4.encode`. Returns an `AutoChoice`.
+    """
+    if version not in CANDIDATES:
+        raise ValueError(f"NVGIFv{version} has no compression to choose")
+    if not isinstance(policy, Budget) and policy not in POLICIES:
+        raise ValueError(f"Unsupported compression policy: {policy!r}")
+
+    width, height = img.size
+    bpp = 4 if alpha and version >= 3 else 3
+    indexed = None
+    if version == 4 and palette is not False and width * height:
+        indexed = palette_buffer(img, bpp)
+    if indexed is not None:
+        table, indices = indexed
+        buf, rows = _sample_indices(indices, width, height, sample_rows)
+        bpp, extra = 1, len(table)
+    else:
+        buf, rows = _sample(img, bpp, sample_rows)
+        extra = 0
+    scale = height / rows if rows else 0
+
+    estimates = []
+    for compression in CANDIDATES[version]:
+        size, seconds = _encode_sample(buf, width, rows, bpp, compression, level)
+        estimates.append(Estimate(compression, int(size * scale) + extra, seconds * scale))
+
+    smallest = min(estimates, key=lambda e: e.size)
+    fastest = min(estimates, key=lambda e: e.seconds)
+    if policy == "smallest":
+        chosen = smallest
+    elif policy == "fastest":
+        chosen = fastest
+    else:
+        fitting = [e for e in estimates if policy.allows(e)]
+        chosen = min(fitting, key=lambda e: e.size) if fitting else fastest
+    return AutoChoice(chosen.compression, estimates)
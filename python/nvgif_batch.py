@@ -0,0 +1,162 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from nvgif import NVG_SUFFIXES, NVGIF
+
+# One NVGIF per worker process, created on first use.
+_nvgif = None
+
+
+def _worker_nvgif():
+    global _nvgif
+    if _nvgif is None:
+        _nvgif = NVGIF()
+    return _nvgif
+
+
+class BatchResult:
+    """Counts and timing for one `run_batch` call."""
+
+    def __init__(self):
+        self.converted = 0
+        self.skipped = 0
+        self.failures = []
+        self.bytes_in = 0
+        self.seconds = 0.0
+
+    @property
+    def files_per_second(self):
+        return self.converted / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes_in / self.seconds / 1e6 if self.seconds else 0.0
+
+
+def _is_input(path, mode):
+    if mode == "decode":
+        return path.lower().endswith(NVG_SUFFIXES)
+    from PIL import Image
+    return os.path.splitext(path)[1].lower() in Image.registered_extensions()
+
+
+def collect_inputs(patterns, mode):
+    """Expand files, directories and glob patterns into a sorted list of input files.
+
+    Directories contribute the files directly inside them that `mode` can
+    read: `.nvg*` files for decode, anything Pillow opens for encode.
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for entry in os.scandir(pattern):
+                if entry.is_file() and _is_input(entry.path, mode):
+                    found.add(entry.path)
+        elif os.path.isfile(pattern):
+            found.add(pattern)
+        else:
+            found.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(found)
+
+
+def output_path(src, output_dir, mode):
+    stem = os.path.splitext(os.path.basename(src))[0]
+    return os.path.join(output_dir, stem + (".nvg" if mode == "encode" else ".png"))
+
+
+def is_up_to_date(src, dst):
+    try:
+        return os.stat(dst).st_mtime >= os.stat(src).st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def _convert_one(task):
+    mode, src, dst, options = task
+    tmp = None
+    try:
+        nv = _worker_nvgif()
+        # Write next to `dst` and rename into place, so an interrupted or
+        # failed conversion never leaves a partial file that `is_up_to_date`
+        # would take for a finished one. The name is unique per worker
+        # process and keeps the extension Pillow picks the format from.
+        head, name = os.path.split(dst)
+        stem, ext = os.path.splitext(name)
+        tmp = os.path.join(head, f".{stem}.{os.getpid()}.tmp{ext}")
+        if mode == "encode":
+            nv.encode(src, tmp, **options)
+        else:
+            nv.decode(src, tmp)
+        os.replace(tmp, dst)
+        tmp = None
+        return src, os.path.getsize(src), None
+    except Exception as e:
+        return src, 0, f"{type(e).__name__}: {e}"
+    finally:
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def run_batch(mode, inputs, output_dir, jobs=None, version=4, compression=None, alpha=0, force=False,
+              level=9, policy="smallest"):
+    """Encode or decode every file matched by `inputs` into `output_dir` using a process pool.
+
+    Outputs newer than their input are skipped unless `force` is set.
+    Inputs that would write the same output file (such as `a/x.png` and
+    `b/x.png`) are all recorded as failures and none of them is converted.
+    Outputs are written to a temporary file and renamed into place.
+    Returns a `BatchResult`; a failing file is recorded, not raised, and
+    if a worker process dies every file without a result is recorded too.
+    """
+    result = BatchResult()
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    options = {}
+    if mode == "encode":
+        options = {"version": version, "compression": compression, "alpha": alpha, "level": level, "policy": policy}
+    by_output = {}
+    for src in collect_inputs(inputs, mode):
+        dst = output_path(src, output_dir, mode)
+        by_output.setdefault(os.path.normcase(dst), []).append((src, dst))
+    tasks = []
+    for pairs in by_output.values():
+        if len(pairs) > 1:
+            for src, dst in pairs:
+                others = ", ".join(other for other, _ in pairs if other != src)
+                result.failures.append((src, f"{dst} would also be written by {others}"))
+            continue
+        src, dst = pairs[0]
+        if not force and is_up_to_date(src, dst):
+            result.skipped += 1
+        else:
+            tasks.append((mode, src, dst, options))
+
+    if tasks:
+        jobs = jobs or os.cpu_count() or 1
+        # Large chunks keep scheduling overhead low on archives with many small files.
+        chunksize = max(1, min(64, len(tasks) // (jobs * 8)))
+        done = 0
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            try:
+                for src, size, error in pool.map(_convert_one, tasks, chunksize=chunksize):
+                    done += 1
+                    if error is None:
+                        result.converted += 1
+                        result.bytes_in += size
+                    else:
+                        result.failures.append((src, error))
+            except BrokenProcessPool as e:
+                # A worker died (killed, out of memory, crashed in C code);
+                # every file without a result is reported rather than lost.
+                for _, src, _, _ in tasks[done:]:
+                    result.failures.append((src, f"{type(e).__name__}: {e}"))
+
+    result.seconds = time.perf_counter() - start
+    return result
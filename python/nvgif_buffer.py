@@ -0,0 +1,153 @@
+import mmap
+import os
+from contextlib import contextmanager
+
+from nvgif_stats import timed
+
+
+class BufferReader:
+    """File-like reader over a bytes-like object.
+
+    `read` returns memoryview slices of the underlying buffer instead of
+    copies, so decoders can work directly on an mmap of the file.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+        # Kept so the size can still be reported after `close`.
+        self._size = len(self._view)
+
+    def read(self, n=-1):
+        end = len(self._view) if n is None or n < 0 else min(self._pos + n, len(self._view))
+        out = self._view[self._pos:end]
+        self._pos = end
+        return out
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def __len__(self):
+        return self._size
+
+    def peek(self, n=1):
+        return bytes(self._view[self._pos:self._pos + n])
+
+    def release(self):
+        self._view.release()
+
+    def close(self):
+        """Release the buffer and close the mmap underneath, if any.
+
+        Slices returned by `read` that are still alive keep the mapping
+        open; it is unmapped once they are gone.
+        """
+        self._view.release()
+        if isinstance(self._data, mmap.mmap):
+            try:
+                self._data.close()
+            except BufferError:
+                pass
+
+
+def map_file(f):
+    """Map the open binary file `f` read-only; empty files map to `b""`."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_buffer(source):
+    """Return a `BufferReader` over the NVGIF in `source`.
+
+    Paths are mapped with `map_file`, readable binary file objects are read
+    from their current position to the end, and a `BufferReader` is
+    returned as-is so callers can hand one reader down without re-reading.
+    """
+    if isinstance(source, BufferReader):
+        return source
+    if hasattr(source, "read"):
+        return BufferReader(source.read())
+    with open(source, "rb") as f:
+        return BufferReader(map_file(f))
+
+
+@contextmanager
+def open_buffer(source, stats=None):
+    """`read_buffer` for a `with` block, timed as the "read" stage of `stats`.
+
+    A reader made here is closed when the block exits, unmapping the file;
+    a `BufferReader` passed in belongs to the caller and is left open.
+    """
+    with timed(stats, "read"):
+        reader = read_buffer(source)
+    try:
+        yield reader
+    finally:
+        if reader is not source:
+            reader.close()
+
+
+@contextmanager
+def input_file(source):
+    """Open the path `source` for reading, or pass a readable file object through unclosed."""
+    if hasattr(source, "read"):
+        yield source
+    else:
+        with open(source, "rb") as f:
+            yield f
+
+
+@contextmanager
+def output_file(target):
+    """Open the path `target` for writing, or pass a writable file object through unclosed."""
+    if hasattr(target, "write"):
+        yield target
+    else:
+        with open(target, "wb") as f:
+            yield f
+
+
+def peek_header(f, n):
+    """Return up to `n` bytes from the current position of `f` without consuming them."""
+    if hasattr(f, "peek"):
+        return bytes(f.peek(n)[:n])
+    pos = f.tell()
+    header = f.read(n)
+    f.seek(pos)
+    return bytes(header)
+
+
+def output_view(out, shape):
+    """Return a flat writable byte view of `out` after checking it fits an image of `shape`.
+
+    `shape` is `(height, width, channels)`. `out` may be a bytearray or a
+    writable one-byte memoryview of exactly that many bytes, or a
+    C-contiguous uint8 array of exactly that shape (a NumPy array, say).
+    Raises ValueError otherwise.
+    """
+    try:
+        view = memoryview(out)
+    except TypeError:
+        raise ValueError(f"Output must be a writable buffer, not {type(out).__name__}") from None
+    if view.readonly:
+        raise ValueError("Cannot decode into a read-only buffer")
+    if view.format != "B":
+        raise ValueError(f"Output buffer must hold unsigned bytes, not format {view.format!r}")
+    if not view.c_contiguous:
+        raise ValueError("Output buffer must be C-contiguous")
+    if view.ndim != 1 and tuple(view.shape) != tuple(shape):
+        raise ValueError(f"Output array has shape {tuple(view.shape)}, expected {tuple(shape)}")
+    size = shape[0] * shape[1] * shape[2]
+    if view.nbytes != size:
+        raise ValueError(f"Output buffer holds {view.nbytes} bytes, expected {size} for {shape[1]}x{shape[0]}x{shape[2]}")
+    return view.cast("B") if view.ndim != 1 else view
@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Bytes Pillow keeps per pixel; every other mode used here (RGB included,
+# which Pillow pads to 4 bytes) takes four.
+_PIXEL_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2}
+
+
+def image_nbytes(image):
+    """Approximate memory held by the pixels of a `PIL.Image.Image`."""
+    return image.width * image.height * _PIXEL_BYTES.get(image.mode, 4)
+
+
+class DecodeCache:
+    """Least-recently-used cache of decoded images under a byte budget.
+
+    Attach one with `NVGIF(cache=DecodeCache(...))`. Entries are keyed by
+    `(path, mtime_ns, size, mode, ...)`, the requested mode and any other
+    decode options, so a file rewritten in place is decoded again rather
+    than served stale. When the cached pixels exceed `max_bytes`, the
+    least recently used entries are dropped; an image larger than the
+    whole budget is returned but not kept.
+
+    Every image handed out is a copy, so callers may draw on or resize it
+    without touching the cached entry. All methods are thread-safe; two
+    threads missing on the same key both decode it and the last one wins.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path, mode=None, *options):
+        """Return the cache key of the file at `path` decoded to `mode` with `options`, from its current stat."""
+        st = os.stat(path)
+        return (os.path.realpath(path), st.st_mtime_ns, st.st_size, mode) + options
+
+    def get(self, key):
+        """Return a copy of the image cached under `key`, or None, updating the counters."""
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return image.copy()
+
+    def put(self, key, image):
+        """Cache `image` under `key` and evict down to the budget; the caller keeps `image`."""
+        size = image_nbytes(image)
+        if size > self.max_bytes:
+            return
+        # Keep a private copy: the caller is free to modify the one it has.
+        image = image.copy()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= image_nbytes(old)
+            self._entries[key] = image
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= image_nbytes(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __repr__(self):
+        return (f"DecodeCache({len(self)} entries, {self.nbytes}/{self.max_bytes} bytes, "
+                f"hits={self.hits}, misses={self.misses}, evictions={self.evictions})")
@@ -1,37 +1,105 @@
 import argparse
+import sys
+import time
+from functools import lru_cache
 from nvgif import NVGIF
+from nvgif_batch import run_batch
+from nvgif_pixels import draft_scale, scale_step, scaled_size
+from nvgif_scan import default_cache_path, run_scan
+from nvgif_stats import Stats
 from nvgif_v2 import NVGIFv2
 from nvgif_v3 import NVGIFv3
 from nvgif_v4 import NVGIFv4
+from nvgif_v5 import NVGIFv5
 from PIL import Image, ImageTk
 import tkinter as tk
 
+@lru_cache(maxsize=4)
 def make_checker(size, square=8, c1=(192, 192, 192), c2=(255, 255, 255)):
-    bg = Image.new("RGB", size, c1)
-    for y in range(0, size[1], square):
-        for x in range(0, size[0], square):
-            if (x // square + y // square) % 2 == 0:
-                for i in range(square):
-                    for j in range(square):
-                        if x + i < size[0] and y + j < size[1]:
-                            bg.putpixel((x + i, y + j), c2)
+    """Return an RGBA checkerboard of `size`. Cached per size, so callers must not modify it."""
+    w, h = size
+    cols, rows = -(-w // square), -(-h // square)
+    # One byte per square, 255 where it takes `c2`, scaled up to whole
+    # squares and pasted through as a mask.
+    cells = b"".join((b"\xff\x00" * (cols // 2 + 1))[y % 2:y % 2 + cols] for y in range(rows))
+    mask = Image.frombytes("L", (cols, rows), cells).resize((cols * square, rows * square), Image.NEAREST)
+    bg = Image.new("RGBA", size, c1)
+    bg.paste(c2, (0, 0, w, h), mask.crop((0, 0, w, h)))
     return bg
 
-def view_image(img, title="Viewer"):
-    w, h = img.size
+def fit_size(width, height, screen):
+    """Return the size at which a `width` x `height` image fits in 90% of `screen`, never enlarged."""
+    scale = min(1, (screen[0] * 0.9) / width, (screen[1] * 0.9) / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def progressive_frames(nv, path, size, budget=0.04):
+    """Yield the NVGIF at `path` on a checkerboard at `size`, filling in as it decodes.
+
+    The file is decoded at the smallest scale of 1/8, 1/4, 1/2 or 1 that
+    still covers `size`. After every `budget` seconds of decoding, the rows
+    decoded so far are resized into place and the frame is yielded; the
+    last frame is the whole image resized with LANCZOS. The same image
+    object is updated and yielded each time.
+    """
+    probe = nv.probe(path)
+    scale = draft_scale(size, probe.width, probe.height)
+    width, height = scaled_size(probe.width, probe.height, scale_step(scale))
+    mode = "RGBA" if probe.alpha else "RGB"
+    checker = make_checker(size)
+    decoded = Image.new(mode, (width, height))
+    frame = checker.copy()
+
+    band = bytearray()
+    band_start = shown = 0
+    deadline = time.perf_counter() + budget
+    for y, row in enumerate(nv.iter_rows(path, scale), 1):
+        band += row
+        if y < height and time.perf_counter() < deadline:
+            continue
+        decoded.paste(Image.frombytes(mode, (width, y - band_start), bytes(band)), (0, band_start))
+        band.clear()
+        band_start = y
+        if y == height:
+            break
+        # Screen rows whose source rows are all in, with one row to spare
+        # for the resampling filter.
+        bottom = (y - 1) * size[1] // height
+        if bottom > shown:
+            box = (0, shown * height / size[1], width, bottom * height / size[1])
+            part = decoded.resize((size[0], bottom - shown), Image.BILINEAR, box=box)
+            frame.alpha_composite(part.convert("RGBA"), (0, shown))
+            shown = bottom
+        yield frame
+        deadline = time.perf_counter() + budget
+
+    frame.paste(checker)
+    frame.alpha_composite(decoded.convert("RGBA").resize(size, Image.LANCZOS))
+    yield frame
+
+def _open_window(title, image_size):
     win = tk.Tk()
     win.title(title)
-    sw, sh = win.winfo_screenwidth(), win.winfo_screenheight()
-    scale = min(1, (sw * 0.9) / w, (sh * 0.9) / h)
-    size = int(w * scale), int(h * scale)
-
+    size = fit_size(*image_size, (win.winfo_screenwidth(), win.winfo_screenheight()))
     canvas = tk.Canvas(win, width=size[0], height=size[1], bg="#888")
     canvas.pack(fill="both", expand=True)
-    checker = make_checker(size)
-    img = img.convert("RGBA").resize(size, Image.LANCZOS)
-    composite = Image.alpha_composite(checker.convert("RGBA"), img)
-    tk_img = ImageTk.PhotoImage(composite)
+    return win, canvas, size
+
+def view_file(nv, path, title="Viewer"):
+    """Show the NVGIF at `path`, drawing rows as they decode instead of waiting for the whole image."""
+    probe = nv.probe(path)
+    win, canvas, size = _open_window(title, (probe.width, probe.height))
+    frames = progressive_frames(nv, path, size)
+    tk_img = ImageTk.PhotoImage(make_checker(size))
     canvas.create_image(size[0] // 2, size[1] // 2, anchor="center", image=tk_img)
+
+    def refresh():
+        # One decoding slice per event-loop turn keeps the window responsive.
+        frame = next(frames, None)
+        if frame is not None:
+            tk_img.paste(frame)
+            win.after(1, refresh)
+
+    win.after(1, refresh)
     win.mainloop()
 
 def main():
@@ -44,13 +112,30 @@ def main():
     encode = sub.add_parser("encode", help="Encode PNG to NVGIF")
     encode.add_argument("input", help="Input image file (.png/.jpeg/.bmp/etc.)")
     encode.add_argument("output", help="Output file (.nvg)")
-    encode.add_argument("--version", type=int, choices=[1, 2, 3, 4], default=4, help="NVGIF version (default: 4)")
-    encode.add_argument("--compression", choices=["none", "rle", "zlib", "rlezlib"], help="Compression for NVGIF")
+    encode.add_argument("--version", type=int, choices=[1, 2, 3, 4, 5], default=4, help="NVGIF version (default: 4; 5 is tiled, for large images)")
+    encode.add_argument("--compression", choices=["none", "rle", "zlib", "rlezlib", "auto"], help="Compression for NVGIF (auto: estimate and pick)")
     encode.add_argument("--alpha", action="store_true", help="Enable alpha (NVGIF v3+ only)")
+    encode.add_argument("--level", type=int, choices=range(10), default=9, metavar="0-9", help="Zlib effort for zlib/rlezlib (default: 9)")
+    encode.add_argument("--policy", choices=["smallest", "fastest"], default="smallest", help="What --compression auto optimizes for (default: smallest)")
+    encode.add_argument("--index", type=int, metavar="ROWS", help="Write a row offset index every ROWS rows for region decoding (NVGIF v4 only)")
+    encode.add_argument("--tile", type=int, default=256, metavar="SIZE", help="Tile width and height in pixels (NVGIF v5 only, default: 256)")
+    encode.add_argument("--palette", action="store_const", const=None, default=False, help="Store images of at most 256 colours as palette indices (NVGIF v4 only; other decoders cannot read them)")
+    encode.add_argument("--stats", action="store_true", help="Print a per-stage timing breakdown")
 
     decode = sub.add_parser("decode", help="Convert NVGIF to PNG")
     decode.add_argument("input", help="Input .nvg file")
     decode.add_argument("output", help="Output file (.png)")
+    decode.add_argument("--stats", action="store_true", help="Print a per-stage timing breakdown")
+
+    convert = sub.add_parser("convert", help="Convert an NVGIF to another version or compression")
+    convert.add_argument("input", help="Input .nvg file")
+    convert.add_argument("output", help="Output .nvg file")
+    convert.add_argument("--version", type=int, choices=[1, 2, 3, 4, 5], default=4, help="Target NVGIF version (default: 4)")
+    convert.add_argument("--compression", choices=["none", "rle", "zlib", "rlezlib"], help="Target compression (default depends on version)")
+    convert.add_argument("--alpha", action=argparse.BooleanOptionalAction, help="Keep (default), add or drop the alpha channel (NVGIF v3+ only)")
+    convert.add_argument("--level", type=int, choices=range(10), default=9, metavar="0-9", help="Zlib effort for zlib/rlezlib (default: 9)")
+    convert.add_argument("--index", type=int, metavar="ROWS", help="Write a row offset index every ROWS rows (NVGIF v4 only)")
+    convert.add_argument("--stats", action="store_true", help="Print a per-stage timing breakdown")
 
     info = sub.add_parser("info", help="Display basic header info from a NVGIF file")
     info.add_argument("input", help="Input image file (.nvg)")
@@ -58,23 +143,91 @@ def main():
     view = sub.add_parser("view", help="View a still NVGIF")
     view.add_argument("input", help="Input .nvg file")
 
+    batch = sub.add_parser("batch", help="Encode or decode many files in parallel")
+    batch.add_argument("mode", choices=["encode", "decode"], help="Convert images to NVGIF or NVGIFs to PNG")
+    batch.add_argument("inputs", nargs="+", help="Input files, directories or glob patterns")
+    batch.add_argument("-o", "--output-dir", required=True, help="Directory to write converted files to")
+    batch.add_argument("-j", "--jobs", type=int, help="Worker processes (default: CPU count)")
+    batch.add_argument("--version", type=int, choices=[1, 2, 3, 4, 5], default=4, help="NVGIF version (default: 4)")
+    batch.add_argument("--compression", choices=["none", "rle", "zlib", "rlezlib", "auto"], help="Compression for NVGIF (auto: estimate and pick per file)")
+    batch.add_argument("--alpha", action="store_true", help="Enable alpha (NVGIF v3+ only)")
+    batch.add_argument("--level", type=int, choices=range(10), default=9, metavar="0-9", help="Zlib effort for zlib/rlezlib (default: 9)")
+    batch.add_argument("--policy", choices=["smallest", "fastest"], default="smallest", help="What --compression auto optimizes for (default: smallest)")
+    batch.add_argument("--force", action="store_true", help="Convert even if the output is newer than the input")
+
+    scan = sub.add_parser("scan", help="List header metadata of every NVGIF under a directory")
+    scan.add_argument("input", help="Directory to scan recursively")
+    scan.add_argument("-o", "--output", help="Output file (default: stdout)")
+    scan.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="Output format (default: jsonl)")
+    scan.add_argument("-j", "--jobs", type=int, help="Reader threads (default: 4 per CPU, at most 32)")
+    scan.add_argument("--cache", help="Cache file for unchanged files (default: one per directory in the user cache directory)")
+    scan.add_argument("--no-cache", action="store_true", help="Probe every file and do not write a cache")
+
     args = parser.parse_args()
     nv = NVGIF()
 
-    if args.command == "encode":        if args.compression is None:            args.compression = NVGIF.DEFAULT_COMPRESSIONS[args.version]        c_map = {            2: {"none": NVGIFv2.COMPRESSION_NONE, "rle": NVGIFv2.COMPRESSION_RLE},            3: {"none": NVGIFv3.COMPRESSION_NONE, "rle": NVGIFv3.COMPRESSION_RLE},            4: {                "none": NVGIFv4.COMPRESSION_NONE,                "rle": NVGIFv4.COMPRESSION_RLE,                "zlib": NVGIFv4.COMPRESSION_ZLIB,                "rlezlib": NVGIFv4.COMPRESSION_RLE_ZLIB,            },        }        a_map = {            3: lambda: NVGIFv3.ALPHA_ENABLED if args.alpha else NVGIFv3.ALPHA_DISABLED,            4: lambda: NVGIFv4.ALPHA_ENABLED if args.alpha else NVGIFv4.ALPHA_DISABLED,        }        kwargs = {}        if args.version in c_map:            kwargs["compression"] = c_map[args.version].get(args.compression)        if args.version in a_map:            kwargs["alpha"] = a_map[args.version]()        nv.encode(args.input, args.output, version=args.version, **kwargs)        print(f"✓ Encoded NVGIF v{args.version}: {args.input} → {args.output}")
+    if args.command == "encode":        if args.compression is None:            args.compression = NVGIF.DEFAULT_COMPRESSIONS[args.version]        c_map = {            2: {"none": NVGIFv2.COMPRESSION_NONE, "rle": NVGIFv2.COMPRESSION_RLE},            3: {"none": NVGIFv3.COMPRESSION_NONE, "rle": NVGIFv3.COMPRESSION_RLE},            4: {                "none": NVGIFv4.COMPRESSION_NONE,                "rle": NVGIFv4.COMPRESSION_RLE,                "zlib": NVGIFv4.COMPRESSION_ZLIB,                "rlezlib": NVGIFv4.COMPRESSION_RLE_ZLIB,            },            5: {                "none": NVGIFv5.COMPRESSION_NONE,                "rle": NVGIFv5.COMPRESSION_RLE,                "zlib": NVGIFv5.COMPRESSION_ZLIB,                "rlezlib": NVGIFv5.COMPRESSION_RLE_ZLIB,            },        }        a_map = {            3: lambda: NVGIFv3.ALPHA_ENABLED if args.alpha else NVGIFv3.ALPHA_DISABLED,            4: lambda: NVGIFv4.ALPHA_ENABLED if args.alpha else NVGIFv4.ALPHA_DISABLED,            5: lambda: NVGIFv5.ALPHA_ENABLED if args.alpha else NVGIFv5.ALPHA_DISABLED,        }        kwargs = {}        if args.version in c_map:            if args.compression == "auto":                kwargs["compression"] = "auto"            else:                kwargs["compression"] = c_map[args.version].get(args.compression)        if args.version in a_map:            kwargs["alpha"] = a_map[args.version]()        stats = Stats() if args.stats else None        chosen = nv.encode(args.input, args.output, version=args.version, level=args.level, policy=args.policy,                           index_interval=args.index, stats=stats, tile_size=(args.tile, args.tile), palette=args.palette,                           **kwargs)        print(f"✓ Encoded NVGIF v{args.version} ({chosen}): {args.input} → {args.output}")        if stats:            print(stats.report())
 
     elif args.command == "decode":
-        nv.decode(args.input, args.output)
+        stats = Stats() if args.stats else None
+        nv.decode(args.input, args.output, stats=stats)
         print(f"✓ Decoded NVGIF: {args.input} → {args.output}")
+        if stats:
+            print(stats.report())
+
+    elif args.command == "convert":
+        stats = Stats() if args.stats else None
+        alpha = None if args.alpha is None else int(args.alpha)
+        try:
+            chosen = nv.transcode(args.input, args.output, version=args.version, compression=args.compression,
+                                  alpha=alpha, level=args.level, index_interval=args.index, stats=stats)
+        except ValueError as e:
+            print(f"✗ {e}")
+            raise SystemExit(1)
+        print(f"✓ Converted to NVGIF v{args.version} ({chosen}): {args.input} → {args.output}")
+        if stats:
+            print(stats.report())
+
+    elif args.command == "info":        try:            p = nv.probe(args.input)        except ValueError as e:            print(f"✗ {e}")            raise SystemExit(1)        if p.version == 1:            print(f"NVGIF v1 — {p.width}×{p.height}")        else:            c = {"none": "None", "rle": "RLE", "zlib": "Zlib", "rlezlib": "RLE+Zlib"}[p.compression]            a = "Yes" if p.alpha else "No"            print(f"NVGIF v{p.version} — {p.width}×{p.height}, compression={c}, alpha={a}" + (f", palette={p.palette} colours" if p.palette else ""))
+
+    elif args.command == "view":        view_file(nv, args.input, f"NVGIF — {args.input}")
 
-    elif args.command == "info":        with open(args.input, "rb") as f:            hdr = f.read(11)        ver = hdr[3]        if ver == 1:            w = int.from_bytes(hdr[4:6], "big")            h = int.from_bytes(hdr[6:8], "big")            print(f"NVGIF v1 — {w}×{h}")        elif ver in (2, 3, 4):            c = {
-                0: "None",
-                1: "RLE",
-                2: "Zlib",
-                3: "RLE+Zlib",
-            }[hdr[4]]            a = hdr[5] if ver >= 3 else None            w = int.from_bytes(hdr[6:8], "big")            h = int.from_bytes(hdr[8:10], "big")            print(f"NVGIF v{ver} — {w}×{h}, compression={c}, alpha={a and "Yes" or "No"}")        else:            print("✗ Unsupported NVGIF version")
+    elif args.command == "batch":
+        result = run_batch(
+            args.mode,
+            args.inputs,
+            args.output_dir,
+            jobs=args.jobs,
+            version=args.version,
+            compression=args.compression,
+            alpha=1 if args.alpha and args.version >= 3 else 0,
+            level=args.level,
+            policy=args.policy,
+            force=args.force,
+        )
+        for src, error in result.failures:
+            print(f"✗ {src}: {error}")
+        print(
+            f"✓ {result.converted} converted, {result.skipped} up to date, {len(result.failures)} failed "
+            f"in {result.seconds:.1f}s ({result.files_per_second:.1f} files/s, {result.mb_per_second:.1f} MB/s)"
+        )
+        if result.failures:
+            raise SystemExit(1)
 
-    elif args.command == "view":        img = nv.decode(args.input)        view_image(img, f"NVGIF — {args.input}")
+    elif args.command == "scan":
+        cache = None if args.no_cache else args.cache or default_cache_path(args.input)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                result = run_scan(args.input, out, args.format, args.jobs, cache)
+        else:
+            result = run_scan(args.input, sys.stdout, args.format, args.jobs, cache)
+        print(
+            f"✓ Scanned {result.files} files ({result.cached} cached, {result.failed} failed) "
+            f"in {result.seconds:.1f}s ({result.files_per_second:.0f} files/s)",
+            file=sys.stderr,
+        )
+        if result.failed:
+            raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,120 @@
+"""Pillow plugin for NVGIF.
+
+Importing this module registers NVGIF with Pillow, so `Image.open` works
+on `.nvg` (and `.nvg1` to `.nvg5`) files of every version. Opening reads
+only the header; pixels are decoded when the image is loaded, a batch of
+rows at a time straight into Pillow's image memory. Palette v4 files open
+as `P` images. `draft` (and so `thumbnail`) reduces the image by 2, 4 or
+8 while decoding, skipping the rows it does not need.
+
+Only Pillow's public plugin interface is used: plain tile tuples and
+`PyDecoder.set_as_raw`.
+"""
+
+from PIL import Image, ImageFile, ImagePalette
+from nvgif import NVG_SUFFIXES, NVGIF
+from nvgif_buffer import peek_header
+from nvgif_pixels import draft_scale, scale_step, scaled_size
+from nvgif_v1 import NVGIFv1
+from nvgif_v2 import NVGIFv2
+from nvgif_v3 import NVGIFv3
+from nvgif_v4 import NVGIFv4
+from nvgif_v5 import NVGIFv5
+
+_VERSIONS = {1: NVGIFv1, 2: NVGIFv2, 3: NVGIFv3, 4: NVGIFv4, 5: NVGIFv5}
+
+
+def _accept(prefix):
+    return prefix[:3] == b"NVG" and len(prefix) > 3 and prefix[3] in _VERSIONS
+
+
+def _iter_rows(nvg, f, compression, alpha, step):
+    if nvg.VERSION == 1:
+        return nvg._iter_rows(f, step=step)
+    if nvg.VERSION == 2:
+        return nvg._iter_rows(f, compression, step=step)
+    return nvg._iter_rows(f, compression, alpha, step=step)
+
+
+class NVGIFImageFile(ImageFile.ImageFile):
+    format = "NVGIF"
+    format_description = "NVGIF image"
+
+    def _open(self):
+        header = peek_header(self.fp, 4)
+        if not _accept(header):
+            raise SyntaxError("Not an NVGIF file")
+
+        version = header[3]
+        nvg = _VERSIONS[version]()
+        compression, alpha = NVGIF._header_fields(nvg, self.fp)
+
+        self._mode = "RGBA" if alpha & NVGIFv4.ALPHA_ENABLED else "RGB"
+        if getattr(nvg, "palette", None):
+            # `raw` marks the palette to be loaded; its mode says whether
+            # the entries carry alpha.
+            self.palette = ImagePalette.raw(self._mode, nvg.palette)
+            self.palette.mode = self._mode
+            self._mode = "P"
+        self._size = (nvg.width, nvg.height)
+        self.info["version"] = version
+        self.info["compression"] = "none" if version == 1 else NVGIF.compression_name(version, compression)
+        # Tile sizes are only set (and needed) for tiled v5 files.
+        geometry = (nvg.width, nvg.height, getattr(nvg, "tile_width", 0), getattr(nvg, "tile_height", 0))
+        self.tile = [("nvgif", (0, 0) + self.size, self.fp.tell(), (version, compression, alpha) + geometry)]
+
+    def draft(self, mode, size):
+        # Like JPEG: pick a 1/2, 1/4 or 1/8 reduction that stays at least
+        # `size`; the decoder then keeps every Nth row and column.
+        if len(self.tile) != 1 or self.decoderconfig or not size:
+            return None
+        step = scale_step(draft_scale(size, *self.size))
+        if step == 1:
+            return None
+        original = self.size
+        self._size = scaled_size(*original, step)
+        self.decoderconfig = (step,)
+        codec, _, offset, args = self.tile[0]
+        self.tile = [(codec, (0, 0) + self.size, offset, args)]
+        return self.mode, (0, 0, original[0] / step, original[1] / step)
+
+
+class NVGIFDecoder(ImageFile.PyDecoder):
+    """Decodes the rows of an NVGIF payload from the file into the image."""
+
+    _pulls_fd = True
+
+    # Rows handed to Pillow's raw unpacker per call.
+    BATCH_ROWS = 64
+
+    def decode(self, buffer):
+        # `decoderconfig` from `draft`, if any, follows the tile arguments.
+        version, compression, alpha, width, height, tile_width, tile_height, *config = self.args
+        step = config[0] if config else 1
+        nvg = _VERSIONS[version]()
+        nvg.width, nvg.height = width, height
+        if tile_width:
+            nvg.tile_width, nvg.tile_height = tile_width, tile_height
+
+        if self.mode == "P":
+            rawmode = "P"
+        else:
+            rawmode = "RGBA" if alpha & NVGIFv4.ALPHA_ENABLED else "RGB"
+        # Each batch is unpacked into its own band of the image by narrowing
+        # the decoder state to those rows.
+        top, ysize = self.state.yoff, self.state.ysize
+        batch = bytearray()
+        for y, row in enumerate(_iter_rows(nvg, self.fd, compression, alpha, step), 1):
+            batch += row
+            if y % self.BATCH_ROWS == 0 or y == ysize:
+                rows = (y - 1) % self.BATCH_ROWS + 1
+                self.state.yoff, self.state.ysize = top + y - rows, rows
+                self.set_as_raw(bytes(batch), rawmode)
+                batch.clear()
+        self.state.yoff, self.state.ysize = top, ysize
+        return -1, 0
+
+
+Image.register_open(NVGIFImageFile.format, NVGIFImageFile, _accept)
+Image.register_decoder("nvgif", NVGIFDecoder)
+Image.register_extensions(NVGIFImageFile.format, NVG_SUFFIXES)
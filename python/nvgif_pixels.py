@@ -0,0 +1,204 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the stdlib path is used instead
+    np = None
+
+
+def pixel_buffer(img, bpp):
+    """Return the whole frame as one packed RGB (bpp=3) or RGBA (bpp=4) buffer."""
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    if bpp == 3:
+        img = img.convert("RGB")
+    return img.tobytes()
+
+
+def buffer_rows(buf, width, height, bpp):
+    """Yield each row of the packed frame `buf` as bytes."""
+    data = memoryview(buf)
+    row_len = width * bpp
+    for y in range(height):
+        yield bytes(data[y * row_len:(y + 1) * row_len])
+
+
+def pixel_rows(img, bpp):
+    """Yield each row of `img` as packed RGB/RGBA bytes, sliced out of one buffer."""
+    width, height = img.size
+    yield from buffer_rows(pixel_buffer(img, bpp), width, height, bpp)
+
+
+# Reduction factors offered by `draft_scale`, largest first.
+DRAFT_STEPS = (8, 4, 2, 1)
+
+
+def scale_step(scale):
+    """Return the integer step N of a `scale` of 1/N (None meaning 1)."""
+    if scale is None or scale == 1:
+        return 1
+    step = round(1 / scale) if 0 < scale < 1 else 0
+    if step < 2 or abs(step * scale - 1) > 1e-9:
+        raise ValueError(f"Unsupported scale {scale!r}: expected 1/N, such as 1/2, 1/4 or 1/8")
+    return step
+
+
+def draft_scale(size, width, height):
+    """Return the smallest scale of 1/8, 1/4, 1/2 or 1 that keeps a `width` x `height` image at least `size`.
+
+    Matches the reduction Pillow's JPEG `draft` picks for the same request.
+    """
+    scale = min(width // max(1, size[0]), height // max(1, size[1]))
+    step = next(s for s in DRAFT_STEPS if s <= scale or s == 1)
+    return 1 / step
+
+
+def scaled_size(width, height, step):
+    """Size of a `width` x `height` image keeping every `step`th row and column."""
+    return -(-width // step), -(-height // step)
+
+
+def sample_pixels(row, bpp, step):
+    """Return every `step`th pixel of one packed row, starting with the first."""
+    if step == 1:
+        return row
+    if np is not None and len(row) % bpp == 0:
+        return np.frombuffer(row, dtype=np.uint8).reshape(-1, bpp)[::step].tobytes()
+    view = memoryview(row)
+    out = bytearray(-(-len(view) // (bpp * step)) * bpp)
+    for channel in range(bpp):
+        out[channel::bpp] = view[channel::bpp * step]
+    return out
+
+
+# Colours a palette can hold; indices are stored one byte per pixel.
+MAX_PALETTE = 256
+
+# Pixels `palette_buffer` checks for too many colours before converting
+# the whole image.
+PALETTE_PROBE_PIXELS = 4096
+
+
+def _pixel_keys(buf, bpp):
+    # One uint32 per pixel, read straight from the packed bytes. RGB pixels
+    # are read four bytes apart by three and masked to their own bytes.
+    if bpp == 4:
+        return np.frombuffer(buf, dtype="<u4")
+    padded = np.frombuffer(bytes(buf) + b"\0", dtype=np.uint8)
+    return np.ndarray((len(buf) // 3,), dtype="<u4", buffer=padded, strides=(3,)) & 0xFFFFFF
+
+
+# Slots of the hashed palette lookup table: 64 KiB, against 16 MiB for a
+# table indexed by the RGB bytes themselves.
+_PALETTE_HASH_BITS = 16
+
+
+def _sorted_unique(keys):
+    # `np.unique` without its overhead, which dominates on the few thousand
+    # keys this is called with.
+    keys = np.sort(keys)
+    keep = np.empty(len(keys), dtype=bool)
+    keep[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+def _palette_indices(table, keys):
+    # Index of each key in the sorted `table`, through a small lookup table
+    # indexed by a multiplicative hash of the key. With at most 256 entries
+    # in 64K slots one of the first few multipliers is collision-free; a
+    # binary search is the fallback, but is about 14 times slower.
+    shift = np.uint32(32 - _PALETTE_HASH_BITS)
+    for i in range(1, 65):
+        multiplier = np.uint32((i * 0x9E3779B97F4A7C15 >> 32) & 0xFFFFFFFF | 1)
+        slots = (table * multiplier) >> shift
+        if len(_sorted_unique(slots)) == len(table):
+            lut = np.zeros(1 << _PALETTE_HASH_BITS, dtype=np.uint8)
+            lut[slots] = np.arange(len(table))
+            return lut[(keys * multiplier) >> shift]
+    return np.searchsorted(table, keys).astype(np.uint8)
+
+
+def _palette_table(buf, bpp):
+    # Sorted distinct pixel keys of `buf`, or None past `MAX_PALETTE`. Only
+    # the first pixel of each run is collected, in blocks that start small
+    # and double, so images of many colours are rejected after a few
+    # thousand pixels. Pillow's `getcolors` hashes colours that differ only
+    # in blue or alpha to the same slot and can be a hundred times slower.
+    view = memoryview(buf)
+    found = np.empty(0, dtype="<u4")
+    start, block = 0, PALETTE_PROBE_PIXELS * bpp
+    while start < len(view):
+        keys = _pixel_keys(view[start:start + block], bpp)
+        start += block
+        block = min(block * 2, (1 << 18) * bpp)
+        heads = keys[np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+        found = _sorted_unique(np.concatenate((found, keys[:1], heads)))
+        if len(found) > MAX_PALETTE:
+            return None
+    return found
+
+
+def _packed(img, bpp):
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    return img.convert("RGB") if bpp == 3 else img
+
+
+def palette_buffer(img, bpp):
+    """Return `(palette, indices)` for `img` if it has 1 to `MAX_PALETTE` colours, else None.
+
+    `palette` packs one RGB (bpp=3) or RGBA (bpp=4) entry per colour, and
+    `indices` holds one byte per pixel. Empty images have no colours and
+    return None.
+    """
+    if np is not None:
+        # Most images of many colours already have too many in their first
+        # rows, and are rejected before the whole image is converted.
+        width, height = img.size
+        top = img.crop((0, 0, width, min(height, -(-PALETTE_PROBE_PIXELS // max(width, 1)))))
+        if _palette_table(_packed(top, bpp).tobytes(), bpp) is None:
+            return None
+        buf = _packed(img, bpp).tobytes()
+        table = _palette_table(buf, bpp)
+        if table is None or not len(table):
+            return None
+        palette = table.astype("<u4").view(np.uint8).reshape(-1, 4)[:, :bpp].tobytes()
+        return palette, _palette_indices(table, _pixel_keys(buf, bpp)).tobytes()
+
+    img = _packed(img, bpp)
+    buf = img.tobytes()
+    colors = img.getcolors(MAX_PALETTE)
+    if not colors:
+        return None
+    entries = sorted(color for _, color in colors)
+    palette = b"".join(bytes(color) for color in entries)
+    lookup = {bytes(color): i for i, color in enumerate(entries)}
+    return palette, bytes([lookup[buf[i:i + bpp]] for i in range(0, len(buf), bpp)])
+
+
+def expand_palette(indices, palette, bpp, out=None):
+    """Map one-byte `indices` through `palette` to packed RGB/RGBA pixels.
+
+    The pixels are written into the writable buffer `out` if given (and
+    `out` returned), else returned as bytes. Raises ValueError for an index
+    past the end of the palette.
+    """
+    count = len(palette) // bpp
+    if np is not None:
+        picks = np.frombuffer(indices, dtype=np.uint8)
+        if len(picks) and picks.max() >= count:
+            raise ValueError(f"Palette index {int(picks.max())} is past the {count}-colour palette")
+        table = np.frombuffer(palette, dtype=np.uint8).reshape(-1, bpp)
+        if out is None:
+            return table[picks].tobytes()
+        # Indices are checked above, so "clip" only skips NumPy's buffering.
+        np.take(table, picks, axis=0, out=np.frombuffer(out, dtype=np.uint8).reshape(-1, bpp), mode="clip")
+        return out
+    table = [bytes(palette[i * bpp:(i + 1) * bpp]) for i in range(count)]
+    try:
+        pixels = b"".join(map(table.__getitem__, indices))
+    except IndexError:
+        raise ValueError(f"Palette index {max(indices)} is past the {count}-colour palette") from None
+    if out is None:
+        return pixels
+    out[:] = pixels
+    return out
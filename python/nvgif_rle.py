@@ -0,0 +1,192 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the stdlib path is used instead
+    np = None
+
+# Runs are stored as a one-byte count followed by one pixel.
+MAX_RUN = 255
+
+# Below this many groups per row, NumPy's call overhead outweighs its gains.
+_NUMPY_MIN_GROUPS = 32
+# Sampling does a few more NumPy calls per row than decoding.
+_NUMPY_MIN_SAMPLE_GROUPS = 64
+
+_RUN_PATTERNS = {}
+
+
+def _run_pattern(bpp):
+    # A pixel followed by any number of copies of itself. Every match is a
+    # multiple of `bpp` bytes long, so matches stay aligned to pixels.
+    pattern = _RUN_PATTERNS.get(bpp)
+    if pattern is None:
+        pattern = _RUN_PATTERNS[bpp] = re.compile(rb"(.{%d})\1*" % bpp, re.DOTALL)
+    return pattern
+
+
+def _encode_row_stdlib(row, bpp):
+    out = bytearray()
+    end = 0
+    for m in _run_pattern(bpp).finditer(row):
+        unit = m.group(1)
+        count = (m.end() - m.start()) // bpp
+        while count > MAX_RUN:
+            out.append(MAX_RUN)
+            out += unit
+            count -= MAX_RUN
+        out.append(count)
+        out += unit
+        end = m.end()
+    if end < len(row):
+        # Trailing partial pixel; only reachable with malformed input.
+        out.append(1)
+        out += row[end:]
+    return out
+
+
+def _encode_rows_numpy(buf, width, height, bpp):
+    if width == 0 or height == 0:
+        return [b""] * height
+
+    units = np.frombuffer(buf, dtype=np.uint8, count=width * height * bpp).reshape(-1, bpp)
+    # A run starts wherever a pixel differs from its left neighbour, and at
+    # the start of every row so that runs never cross row boundaries.
+    differs = units[1:] != units[:-1]
+    is_start = np.empty(len(units), dtype=bool)
+    is_start[0] = True
+    is_start[1:] = differs[:, 0]
+    for channel in range(1, bpp):
+        is_start[1:] |= differs[:, channel]
+    is_start[::width] = True
+    starts = np.flatnonzero(is_start)
+    lengths = np.diff(np.append(starts, len(units)))
+
+    # Runs longer than MAX_RUN are split into full chunks plus a remainder.
+    if lengths.max() <= MAX_RUN:
+        chunk_starts, counts = starts, lengths
+    else:
+        chunks = (lengths + MAX_RUN - 1) // MAX_RUN
+        run_of_chunk = np.repeat(np.arange(len(starts)), chunks)
+        first_chunk = np.cumsum(chunks) - chunks
+        chunk_no = np.arange(len(run_of_chunk)) - first_chunk[run_of_chunk]
+        chunk_starts = starts[run_of_chunk] + chunk_no * MAX_RUN
+        counts = np.minimum(lengths[run_of_chunk] - chunk_no * MAX_RUN, MAX_RUN)
+
+    out = np.empty((len(counts), 1 + bpp), dtype=np.uint8)
+    out[:, 0] = counts
+    out[:, 1:] = units[chunk_starts]
+    data = out.tobytes()
+
+    # Chunk index at which each row begins, in bytes of the encoded stream.
+    row_of_chunk = chunk_starts // width
+    bounds = np.searchsorted(row_of_chunk, np.arange(height + 1)) * (1 + bpp)
+    return [data[bounds[y]:bounds[y + 1]] for y in range(height)]
+
+
+def _decode_stdlib(data, bpp):
+    step = 1 + bpp
+    if isinstance(data, memoryview):
+        # Slices of a memoryview cannot be repeated with `*`.
+        data = data.tobytes()
+    return b"".join([data[i + 1:i + step] * data[i] for i in range(0, len(data), step)])
+
+
+def _decode_numpy(data, bpp):
+    step = 1 + bpp
+    if len(data) < _NUMPY_MIN_GROUPS * step or len(data) % step:
+        # Few long runs are cheaper as bytes repetition, and a malformed
+        # trailing group must keep the exact stdlib semantics.
+        return _decode_stdlib(data, bpp)
+    groups = np.frombuffer(data, dtype=np.uint8).reshape(-1, step)
+    return np.repeat(groups[:, 1:], groups[:, 0], axis=0).tobytes()
+
+
+def rle_encode(row, bpp):
+    """RLE-encode one row of packed pixels into `[count][pixel]` groups."""
+    if np is not None and len(row) % bpp == 0:
+        return _encode_rows_numpy(row, len(row) // bpp, 1, bpp)[0]
+    return bytes(_encode_row_stdlib(row, bpp))
+
+
+def _encode_rows_parallel(buf, width, height, bpp, workers):
+    row_len = width * bpp
+    # A few bands per worker evens out rows that are cheaper than others.
+    band = max(1, -(-height // (workers * 4)))
+    view = memoryview(buf)
+    bands = [bytes(view[y * row_len:min(y + band, height) * row_len]) for y in range(0, height, band)]
+    heights = [min(band, height - y) for y in range(0, height, band)]
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for encoded in pool.map(rle_encode_rows, bands, [width] * len(bands), heights, [bpp] * len(bands)):
+            rows.extend(encoded)
+    return rows
+
+
+def rle_encode_rows(buf, width, height, bpp, workers=None):
+    """RLE-encode every row of a packed frame; returns one encoded bytes per row.
+
+    Runs never cross row boundaries, so the result matches calling
+    `rle_encode` on each row in turn. With `workers` > 1 the frame is split
+    into row bands that are encoded in a process pool and joined in order.
+    """
+    if workers and workers > 1 and height > 1:
+        return _encode_rows_parallel(buf, width, height, bpp, workers)
+    if np is not None:
+        return _encode_rows_numpy(buf, width, height, bpp)
+    row_len = width * bpp
+    view = memoryview(buf)
+    return [bytes(_encode_row_stdlib(view[y * row_len:(y + 1) * row_len], bpp))
+            for y in range(height)]
+
+
+def _sample_stdlib(data, bpp, step):
+    group = 1 + bpp
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    out = bytearray()
+    x = 0
+    wanted = 0
+    for i in range(0, len(data), group):
+        # Pixels wanted..x-1 come from this group; keep every `step`th.
+        x += data[i]
+        if wanted < x:
+            picks = (x - wanted + step - 1) // step
+            out += data[i + 1:i + group] * picks
+            wanted += picks * step
+    return out, x
+
+
+def _sample_numpy(data, bpp, step):
+    groups = np.frombuffer(data, dtype=np.uint8).reshape(-1, 1 + bpp)
+    counts = groups[:, 0]
+    # One opaque item per group's pixel, picked by the group index of every
+    # `step`th output pixel; only indices are expanded, never pixels.
+    units = np.ascontiguousarray(groups[:, 1:]).view(f"V{bpp}").ravel()
+    picks = np.repeat(np.arange(len(groups)), counts)[::step]
+    return units[picks].tobytes(), int(counts.sum())
+
+
+def rle_sample(data, bpp, step, width):
+    """Return every `step`th pixel of an RLE row `width` pixels wide, without expanding its runs.
+
+    Raises ValueError if the runs do not cover exactly `width` pixels.
+    """
+    if len(data) % (1 + bpp):
+        raise ValueError("RLE row ends inside a group")
+    if np is not None and len(data) >= _NUMPY_MIN_SAMPLE_GROUPS * (1 + bpp):
+        out, covered = _sample_numpy(data, bpp, step)
+    else:
+        out, covered = _sample_stdlib(data, bpp, step)
+    if covered != width:
+        raise ValueError(f"RLE row covers {covered} pixels, expected {width}")
+    return out
+
+
+def rle_decode(data, bpp):
+    """Expand `[count][pixel]` groups back into packed pixels."""
+    if np is not None:
+        return _decode_numpy(data, bpp)
+    return _decode_stdlib(data, bpp)
@@ -0,0 +1,194 @@
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from nvgif import NVG_SUFFIXES, NVGIF, NVGIFProbe
+
+# Columns of a scan record, in output order.
+FIELDS = NVGIFProbe.__slots__ + ("mtime", "error")
+
+FORMATS = ("jsonl", "csv")
+
+# Caches live in the user's cache directory, one file per scanned root,
+# so scanning never writes into the archive itself.
+CACHE_PREFIX = "scan-"
+
+# Files probed per thread pool task; keeps the number of futures small on
+# archives with millions of files.
+CHUNK_FILES = 256
+
+
+def user_cache_dir():
+    """Return the per-user directory NVGIF caches are kept in (it may not exist yet)."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "nvgif")
+
+
+def default_cache_path(root):
+    """Return the cache file used for scans of `root` when no other is given."""
+    key = hashlib.sha1(os.path.abspath(root).encode("utf-8", "surrogateescape")).hexdigest()[:16]
+    return os.path.join(user_cache_dir(), f"{CACHE_PREFIX}{key}.json")
+
+
+class ScanCache:
+    """Scan records from earlier runs, keyed by (path, mtime, size).
+
+    Stored as one JSON file together with the `FIELDS` its records have;
+    a cache written with other fields (by an older or newer version) is
+    ignored, as its records would lack columns. `save` keeps only the
+    entries seen by the current scan, so deleted files drop out of the
+    cache. A cache that cannot be written only costs the next scan its
+    speed-up, so `save` warns instead of raising.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.seen = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("fields") == list(FIELDS):
+            self.entries = data.get("entries", {})
+
+    def get(self, path, mtime_ns, size):
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == mtime_ns and entry[1] == size:
+            return entry[2]
+        return None
+
+    def put(self, path, mtime_ns, size, record):
+        self.seen[path] = [mtime_ns, size, record]
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"fields": list(FIELDS), "entries": self.seen}, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            warnings.warn(f"Could not write scan cache {self.path}: {e}", RuntimeWarning, stacklevel=2)
+
+
+class ScanResult:
+    """Counts and timing for one `run_scan` call."""
+
+    def __init__(self):
+        self.files = 0
+        self.cached = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    @property
+    def files_per_second(self):
+        return self.files / self.seconds if self.seconds else 0.0
+
+
+def iter_nvg_files(root):
+    """Yield the paths of all `.nvg*` files under `root`, recursively, in sorted order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(NVG_SUFFIXES):
+                yield os.path.join(dirpath, name)
+
+
+def _probe_chunk(nv, paths, cache):
+    # Runs on a pool thread. Returns (record, was_cached, mtime_ns, size) per path.
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            out.append((_error_record(path, e), False, None, None))
+            continue
+
+        record = cache.get(path, st.st_mtime_ns, st.st_size) if cache else None
+        if record is not None:
+            out.append((record, True, st.st_mtime_ns, st.st_size))
+            continue
+
+        try:
+            record = nv.probe(path).as_dict()
+            record["error"] = None
+        except Exception as e:
+            record = _error_record(path, e)
+        record["mtime"] = st.st_mtime
+        out.append((record, False, st.st_mtime_ns, st.st_size))
+    return out
+
+
+def _error_record(path, error):
+    record = dict.fromkeys(FIELDS)
+    record["path"] = path
+    record["error"] = f"{type(error).__name__}: {error}"
+    return record
+
+
+def scan(root, jobs=None, cache=None, result=None):
+    """Probe every `.nvg*` file under `root` with a thread pool and yield one record dict per file.
+
+    Records come out in path order and have the keys in `FIELDS`; files
+    that cannot be read get an `error` message instead of raising.
+    `cache` is an optional `ScanCache`, consulted before and updated after
+    each probe. `result`, if given, is a `ScanResult` that is filled in.
+    """
+    nv = NVGIF()
+    jobs = jobs or min(32, (os.cpu_count() or 1) * 4)
+    paths = list(iter_nvg_files(root))
+    chunks = [paths[i:i + CHUNK_FILES] for i in range(0, len(paths), CHUNK_FILES)]
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for done in pool.map(lambda chunk: _probe_chunk(nv, chunk, cache), chunks):
+            for record, was_cached, mtime_ns, size in done:
+                if cache is not None and mtime_ns is not None:
+                    cache.put(record["path"], mtime_ns, size, record)
+                if result is not None:
+                    result.files += 1
+                    result.cached += was_cached
+                    result.failed += record["error"] is not None
+                yield record
+
+
+def run_scan(root, out=None, fmt="jsonl", jobs=None, cache_path=None):
+    """Scan `root` and write one record per file to the text stream `out` as JSON Lines or CSV.
+
+    `out` defaults to stdout. With `cache_path` set, unchanged files are
+    answered from the cache at that path, which is rewritten afterwards.
+    Returns a `ScanResult`.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported scan format: {fmt}")
+    out = out or sys.stdout
+    result = ScanResult()
+    start = time.perf_counter()
+    cache = ScanCache(cache_path) if cache_path else None
+
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            out.write(json.dumps({name: record[name] for name in FIELDS}) + "\n")
+
+    for record in scan(root, jobs, cache, result):
+        write(record)
+
+    if cache is not None:
+        cache.save()
+    result.seconds = time.perf_counter() - start
+    return result
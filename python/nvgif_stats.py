@@ -0,0 +1,101 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+# Shared no-op context for `timed` when no stats are being collected.
+_NOOP = nullcontext()
+
+
+class Stats:
+    """Per-stage wall time and counters collected by one encode or decode.
+
+    Pass an instance as `stats=` to any encoder or decoder. Stages are
+    named after what they do ("load", "pixels", "rle", "zlib", "write" on
+    encode; "read", "zlib", "rows", "image", "save" on decode) and a stage
+    that runs several times accumulates its time. `bytes_in`/`bytes_out`
+    are the raw pixel bytes and the file bytes, in the direction of the
+    operation. For RLE modes, `rle_runs` counts `[count][pixel]` groups and
+    `rle_single_runs` the groups with a count of 1.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rows = 0
+        self.rle_runs = 0
+        self.rle_single_runs = 0
+        self.pixels = 0
+        self.raw_bytes = 0
+        self.file_bytes = 0
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count_frame(self, width, height, bpp, file_bytes, decoding=False):
+        """Add one `width` x `height` frame of `bpp`-byte pixels stored in `file_bytes` bytes."""
+        raw_bytes = width * height * bpp
+        self.rows += height
+        self.pixels += width * height
+        self.raw_bytes += raw_bytes
+        self.file_bytes += file_bytes
+        self.bytes_in += file_bytes if decoding else raw_bytes
+        self.bytes_out += raw_bytes if decoding else file_bytes
+
+    def count_runs(self, rows, bpp):
+        """Add the RLE groups of the encoded `rows` to the run counters."""
+        step = 1 + bpp
+        for row in rows:
+            counts = bytes(row[0::step])
+            self.rle_runs += len(counts)
+            self.rle_single_runs += counts.count(1)
+
+    @property
+    def seconds(self):
+        return sum(self.stages.values())
+
+    @property
+    def ratio(self):
+        """Raw pixel bytes per file byte."""
+        return self.raw_bytes / self.file_bytes if self.file_bytes else 0.0
+
+    @property
+    def mean_run(self):
+        """Average pixels per RLE group, or 0 if no runs were counted."""
+        return self.pixels / self.rle_runs if self.rle_runs else 0.0
+
+    def as_dict(self):
+        return {
+            "stages": dict(self.stages),
+            "seconds": self.seconds,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "rows": self.rows,
+            "ratio": self.ratio,
+            "rle_runs": self.rle_runs,
+            "rle_single_runs": self.rle_single_runs,
+            "mean_run": self.mean_run,
+        }
+
+    def report(self):
+        """Return a human-readable breakdown, one line per stage."""
+        total = self.seconds
+        lines = []
+        for name, seconds in self.stages.items():
+            share = seconds / total if total else 0.0
+            lines.append(f"  {name:<8} {seconds * 1000:9.1f} ms  {share:6.1%}")
+        lines.append(f"  {'total':<8} {total * 1000:9.1f} ms")
+        lines.append(f"  {self.rows} rows, {self.bytes_in} → {self.bytes_out} bytes (ratio {self.ratio:.2f}x)")
+        if self.rle_runs:
+            lines.append(f"  {self.rle_runs} RLE runs, {self.rle_single_runs / self.rle_runs:.1%} of length 1, "
+                         f"{self.mean_run:.1f} pixels per run")
+        return "\n".join(lines)
+
+
+def timed(stats, name):
+    """Return `stats.stage(name)`, or a shared no-op context when `stats` is None."""
+    return _NOOP if stats is None else stats.stage(name)
@@ -1,4 +1,7 @@
 from PIL import Image
+from nvgif_buffer import input_file, open_buffer, output_file, output_view
+from nvgif_pixels import buffer_rows, pixel_buffer, sample_pixels, scale_step, scaled_size
+from nvgif_stats import timed
 
 class NVGIFv1:
     HEADER_MAGIC = b"NVG"
@@ -9,61 +12,105 @@ class NVGIFv1:
         self.width = width
         self.height = height
 
-    def encode(self, png_path, nvg_path):
-        if isinstance(png_path, Image.Image):
-            png = png_path
-        else:
-            png = Image.open(png_path).convert("RGBA")
-            
-        png.load()
+    def encode(self, png_path, nvg_path, stats=None):
+        with timed(stats, "load"):
+            if isinstance(png_path, Image.Image):
+                png = png_path
+            else:
+                png = Image.open(png_path).convert("RGBA")
+
+            png.load()
         self.width, self.height = png.size
 
-        with open(nvg_path, "wb") as f:
+        with timed(stats, "pixels"):
+            buf = pixel_buffer(png, 3)
+
+        with output_file(nvg_path) as f, timed(stats, "write"):
             f.write(self.HEADER_MAGIC)
             f.write(bytes([self.VERSION]))
             f.write(self.width.to_bytes(2, "big"))
             f.write(self.height.to_bytes(2, "big"))
 
-            for y in range(self.height):
-                row = bytearray()
-                for x in range(self.width):
-                    r, g, b, *_ = png.getpixel((x, y))
-                    row.extend([r, g, b])
+            for row in buffer_rows(buf, self.width, self.height, 3):
                 f.write(len(row).to_bytes(2, "big"))
                 f.write(row)
 
-    def decode(self, nvg_path, png_path=RETURN_IMAGE):
-        with open(nvg_path, "rb") as f:
-            data = f.read()
+        if stats is not None:
+            stats.count_frame(self.width, self.height, 3, 8 + (2 + self.width * 3) * self.height)
 
-        if not data.startswith(self.HEADER_MAGIC):
+    def _read_header(self, f):
+        header = bytes(f.read(8))
+        if not header.startswith(self.HEADER_MAGIC):
             raise ValueError("Not a valid NVGIF file")
-        version = data[3]
+        if len(header) < 8:
+            raise ValueError("Truncated NVGIF header")
+        version = header[3]
         if version != self.VERSION:
             raise ValueError(f"Unsupported NVGIF version: {version}")
 
-        self.width = int.from_bytes(data[4:6], "big")
-        self.height = int.from_bytes(data[6:8], "big")
-        offset = 8
+        self.width = int.from_bytes(header[4:6], "big")
+        self.height = int.from_bytes(header[6:8], "big")
 
-        png = Image.new("RGBA", (self.width, self.height))
+    def _iter_rows(self, f, step=1):
+        # With `step` > 1 only every `step`th row is read, and only every
+        # `step`th pixel of it kept; the other rows are seeked over.
+        row_size = self.width * 3
         for y in range(self.height):
-            if offset + 2 > len(data):
+            prefix = f.read(2)
+            if len(prefix) < 2:
                 raise ValueError(f"Row {y}: missing length prefix")
-            row_len = int.from_bytes(data[offset:offset+2], "big")
-            offset += 2
-            if offset + row_len > len(data):
+            row_len = int.from_bytes(prefix, "big")
+            if row_len != row_size:
+                raise ValueError(f"Row {y} length mismatch: {row_len} vs expected {row_size}")
+            if y % step:
+                f.seek(row_len, 1)
+                continue
+            row = f.read(row_len)
+            if len(row) < row_len:
                 raise ValueError(f"Row {y}: truncated row")
-            row = data[offset:offset+row_len]
-            offset += row_len
-            if row_len != self.width * 3:
-                raise ValueError(f"Row {y} length mismatch: {row_len} vs expected {self.width * 3}")
-            for x in range(self.width):
-                i = x * 3
-                r, g, b = row[i:i+3]
-                png.putpixel((x, y), (r, g, b, 255))
-                
+            yield sample_pixels(row, 3, step)
+
+    def iter_rows(self, nvg_path, scale=None):
+        """Yield the RGB rows of the NVGIFv1 at `nvg_path` (a path or binary file object), top to bottom."""
+        with input_file(nvg_path) as f:
+            self._read_header(f)
+            yield from self._iter_rows(f, scale_step(scale))
+
+    def _fill(self, reader, pixels, step, stats=None):
+        # Rows are memoryview slices of the buffer, copied once into place.
+        row_size = scaled_size(self.width, self.height, step)[0] * 3
+        with timed(stats, "rows"):
+            for y, row in enumerate(self._iter_rows(reader, step)):
+                pixels[y * row_size:(y + 1) * row_size] = row
+
+    def decode_into(self, nvg_path, out, scale=None, stats=None):
+        """Decode the NVGIFv1 at `nvg_path` into `out`, a writable buffer of `height` x `width` x 3 bytes.
+
+        See `nvgif_buffer.output_view` for the buffers accepted. Returns `out`.
+        """
+        with open_buffer(nvg_path, stats) as reader:
+            self._read_header(reader)
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            self._fill(reader, output_view(out, (height, width, 3)), step, stats)
+        return out
+
+    def decode(self, nvg_path, png_path=RETURN_IMAGE, stats=None, scale=None):
+        with open_buffer(nvg_path, stats) as reader:
+            self._read_header(reader)
+
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            pixels = bytearray(width * 3 * height)
+            self._fill(reader, pixels, step, stats)
+
+        with timed(stats, "image"):
+            png = Image.frombytes("RGB", (width, height), pixels).convert("RGBA")
+        if stats is not None:
+            stats.count_frame(width, height, 3, len(reader), decoding=True)
+
         if png_path != self.RETURN_IMAGE:
-            png.save(png_path)
+            with timed(stats, "save"):
+                png.save(png_path)
         else:
             return png
\ No newline at end of file
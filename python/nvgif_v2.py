@@ -1,4 +1,8 @@
 from PIL import Image
+from nvgif_buffer import input_file, open_buffer, output_file, output_view
+from nvgif_pixels import buffer_rows, pixel_buffer, sample_pixels, scale_step, scaled_size
+from nvgif_rle import rle_decode, rle_encode_rows, rle_sample
+from nvgif_stats import timed
 
 class NVGIFv2:
     HEADER_MAGIC = b"NVG"
@@ -11,97 +15,148 @@ class NVGIFv2:
         self.width = width
         self.height = height
 
-    def encode(self, png_path, nvg_path, compression=COMPRESSION_RLE):
-        if isinstance(png_path, Image.Image):
-            img = png_path
-        else:
-            img = Image.open(png_path).convert("RGBA")
-            
-        img.load()
+    def encode(self, png_path, nvg_path, compression=COMPRESSION_RLE, workers=None, stats=None):
+        with timed(stats, "load"):
+            if isinstance(png_path, Image.Image):
+                img = png_path
+            else:
+                img = Image.open(png_path).convert("RGBA")
+
+            img.load()
         self.width, self.height = img.size
 
-        with open(nvg_path, "wb") as f:
-            f.write(self.HEADER_MAGIC)
-            f.write(bytes([self.VERSION]))
-            f.write(bytes([compression]))
-            f.write(self.width.to_bytes(2, "big"))
-            f.write(self.height.to_bytes(2, "big"))
-
-            for y in range(self.height):
-                row = bytearray()
-                for x in range(self.width):
-                    r, g, b, *_ = img.getpixel((x, y))
-                    row.extend([r, g, b])
-
-                if compression == self.COMPRESSION_RLE:
-                    compressed = self._rle_encode(row)
-                    f.write(len(compressed).to_bytes(2, "big"))
-                    f.write(compressed)
-                else:
-                    f.write(len(row).to_bytes(2, "big"))
-                    f.write(row)
-
-    def decode(self, nvg_path, png_path=RETURN_IMAGE):
-        with open(nvg_path, "rb") as f:
-            data = f.read()
-
-        if not data.startswith(self.HEADER_MAGIC):
+        with timed(stats, "pixels"):
+            buf = pixel_buffer(img, 3)
+        if compression == self.COMPRESSION_RLE:
+            with timed(stats, "rle"):
+                rows = rle_encode_rows(buf, self.width, self.height, 3, workers=workers)
+        else:
+            rows = buffer_rows(buf, self.width, self.height, 3)
+
+        with output_file(nvg_path) as f, timed(stats, "write"):
+            self._write(f, rows, compression)
+
+        if stats is not None:
+            if compression == self.COMPRESSION_RLE:
+                stats.count_runs(rows, 3)
+                payload = sum(map(len, rows))
+            else:
+                payload = self.width * 3 * self.height
+            stats.count_frame(self.width, self.height, 3, 9 + 2 * self.height + payload)
+
+    def _write(self, f, rows, compression):
+        # Header, then every row (RLE groups or packed pixels) behind its
+        # 2-byte length.
+        f.write(self.HEADER_MAGIC)
+        f.write(bytes([self.VERSION]))
+        f.write(bytes([compression]))
+        f.write(self.width.to_bytes(2, "big"))
+        f.write(self.height.to_bytes(2, "big"))
+
+        for row in rows:
+            f.write(len(row).to_bytes(2, "big"))
+            f.write(row)
+
+    def _read_header(self, f):
+        header = bytes(f.read(9))
+        if not header.startswith(self.HEADER_MAGIC):
             raise ValueError("Invalid NVGIF file")
-        version = data[3]
+        if len(header) < 9:
+            raise ValueError("Truncated NVGIF header")
+        version = header[3]
         if version != self.VERSION:
             raise ValueError(f"Wrong version: {version}")
-        compression = data[4]
-        self.width = int.from_bytes(data[5:7], "big")
-        self.height = int.from_bytes(data[7:9], "big")
+        compression = header[4]
+        self.width = int.from_bytes(header[5:7], "big")
+        self.height = int.from_bytes(header[7:9], "big")
+        return compression
 
-        offset = 9
-        img = Image.new("RGBA", (self.width, self.height))
+    def _iter_rows(self, f, compression, stats=None, step=1):
+        # With `step` > 1 only every `step`th row is read, and only every
+        # `step`th pixel of it kept: RLE rows are sampled without expanding
+        # their runs, and the rows in between are seeked over.
+        row_size = -(-self.width // step) * 3
 
         for y in range(self.height):
-            if offset + 2 > len(data):
+            prefix = f.read(2)
+            if len(prefix) < 2:
                 raise ValueError(f"Row {y}: missing length prefix")
-            row_len = int.from_bytes(data[offset:offset + 2], "big")
-            offset += 2
-            raw = data[offset:offset + row_len]
-            offset += row_len
+            row_len = int.from_bytes(prefix, "big")
+            if y % step:
+                f.seek(row_len, 1)
+                continue
+            raw = f.read(row_len)
+            if len(raw) < row_len:
+                raise ValueError(f"Row {y}: truncated row")
 
             if compression == self.COMPRESSION_RLE:
-                row = self._rle_decode(raw)
+                row = rle_decode(raw, 3) if step == 1 else rle_sample(raw, 3, step, self.width)
+                if stats is not None:
+                    stats.count_runs((raw,), 3)
+            elif row_len != self.width * 3:
+                raise ValueError(f"Row {y} length mismatch: got {row_len} bytes")
             else:
-                row = raw
+                row = sample_pixels(raw, 3, step)
 
-            if len(row) != self.width * 3:
+            if len(row) != row_size:
                 raise ValueError(f"Row {y} length mismatch: got {len(row)} bytes")
 
-            for x in range(self.width):
-                i = x * 3
-                r, g, b = row[i:i+3]
-                img.putpixel((x, y), (r, g, b, 255))
-                
+            yield row
+
+    def _iter_encoded_rows(self, f):
+        # The stored rows as they are, without their length prefixes: RLE
+        # groups or packed pixels, depending on the compression.
+        for y in range(self.height):
+            prefix = f.read(2)
+            if len(prefix) < 2:
+                raise ValueError(f"Row {y}: missing length prefix")
+            row_len = int.from_bytes(prefix, "big")
+            row = f.read(row_len)
+            if len(row) < row_len:
+                raise ValueError(f"Row {y}: truncated row")
+            yield row
+
+    def iter_rows(self, nvg_path, scale=None):
+        """Yield the RGB rows of the NVGIFv2 at `nvg_path` (a path or binary file object), top to bottom."""
+        with input_file(nvg_path) as f:
+            compression = self._read_header(f)
+            yield from self._iter_rows(f, compression, step=scale_step(scale))
+
+    def _fill(self, reader, compression, pixels, step, stats=None):
+        # Rows are memoryview slices of the buffer, copied once into place.
+        row_size = scaled_size(self.width, self.height, step)[0] * 3
+        with timed(stats, "rows"):
+            for y, row in enumerate(self._iter_rows(reader, compression, stats, step)):
+                pixels[y * row_size:(y + 1) * row_size] = row
+
+    def decode_into(self, nvg_path, out, scale=None, stats=None):
+        """Decode the NVGIFv2 at `nvg_path` into `out`, a writable buffer of `height` x `width` x 3 bytes.
+
+        See `nvgif_buffer.output_view` for the buffers accepted. Returns `out`.
+        """
+        with open_buffer(nvg_path, stats) as reader:
+            compression = self._read_header(reader)
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            self._fill(reader, compression, output_view(out, (height, width, 3)), step, stats)
+        return out
+
+    def decode(self, nvg_path, png_path=RETURN_IMAGE, stats=None, scale=None):
+        with open_buffer(nvg_path, stats) as reader:
+            compression = self._read_header(reader)
+
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            pixels = bytearray(width * 3 * height)
+            self._fill(reader, compression, pixels, step, stats)
+
+        with timed(stats, "image"):
+            img = Image.frombytes("RGB", (width, height), pixels).convert("RGBA")
+        if stats is not None:
+            stats.count_frame(width, height, 3, len(reader), decoding=True)
+
         if png_path != self.RETURN_IMAGE:
-            img.save(png_path)
+            with timed(stats, "save"):
+                img.save(png_path)
         else:
-            return img
-
-    def _rle_encode(self, row):
-        result = bytearray()
-        i = 0
-        while i < len(row):
-            rgb = row[i:i+3]
-            count = 1
-            while (i + count*3 < len(row)) and (count < 255) and (row[i + count*3:i + (count+1)*3] == rgb):
-                count += 1
-            result.append(count)
-            result += rgb
-            i += 3 * count
-        return result
-
-    def _rle_decode(self, data):
-        result = bytearray()
-        i = 0
-        while i < len(data):
-            count = data[i]
-            rgb = data[i+1:i+4]
-            result.extend(rgb * count)
-            i += 4
-        return result
\ No newline at end of file
+            return img
\ No newline at end of file
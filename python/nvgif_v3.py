@@ -1,4 +1,8 @@
 from PIL import Image
+from nvgif_buffer import input_file, open_buffer, output_file, output_view
+from nvgif_pixels import buffer_rows, pixel_buffer, sample_pixels, scale_step, scaled_size
+from nvgif_rle import rle_decode, rle_encode_rows, rle_sample
+from nvgif_stats import timed
 
 class NVGIFv3:
     HEADER_MAGIC = b"NVG"
@@ -13,93 +17,150 @@ class NVGIFv3:
         self.width = width
         self.height = height
 
-    def encode(self, png_path, nvg_path, compression=COMPRESSION_RLE, alpha=ALPHA_DISABLED):
-        if isinstance(png_path, Image.Image):
-            img = png_path
-        else:
-            img = Image.open(png_path).convert("RGBA")
-            
+    def encode(self, png_path, nvg_path, compression=COMPRESSION_RLE, alpha=ALPHA_DISABLED, workers=None, stats=None):
+        with timed(stats, "load"):
+            if isinstance(png_path, Image.Image):
+                img = png_path
+            else:
+                img = Image.open(png_path).convert("RGBA")
+
         self.width, self.height = img.size
+        bpp = 4 if alpha == self.ALPHA_ENABLED else 3
 
-        with open(nvg_path, "wb") as f:
-            f.write(self.HEADER_MAGIC)
-            f.write(bytes([self.VERSION]))
-            f.write(bytes([compression]))
-            f.write(bytes([alpha]))
-            f.write(self.width.to_bytes(2, "big"))
-            f.write(self.height.to_bytes(2, "big"))
+        with timed(stats, "pixels"):
+            buf = pixel_buffer(img, bpp)
+        if compression == self.COMPRESSION_RLE:
+            with timed(stats, "rle"):
+                rows = rle_encode_rows(buf, self.width, self.height, bpp, workers=workers)
+        else:
+            rows = buffer_rows(buf, self.width, self.height, bpp)
 
-            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+        with output_file(nvg_path) as f, timed(stats, "write"):
+            self._write(f, rows, compression, alpha)
+
+        if stats is not None:
+            if compression == self.COMPRESSION_RLE:
+                stats.count_runs(rows, bpp)
+                payload = sum(map(len, rows))
+            else:
+                payload = self.width * bpp * self.height
+            stats.count_frame(self.width, self.height, bpp, 10 + 2 * self.height + payload)
 
-            for y in range(self.height):
-                row = bytearray()
-                for x in range(self.width):
-                    r, g, b, a = img.getpixel((x, y))
-                    row.extend([r, g, b, a] if bpp == 4 else [r, g, b])
-
-                if compression == self.COMPRESSION_RLE:
-                    compressed = self._rle_encode(row, bpp)
-                    f.write(len(compressed).to_bytes(2, "big"))
-                    f.write(compressed)
-                else:
-                    f.write(len(row).to_bytes(2, "big"))
-                    f.write(row)
-
-    def decode(self, nvg_path, png_path=RETURN_IMAGE):
-        with open(nvg_path, "rb") as f:
-            data = f.read()
-
-        if not data.startswith(self.HEADER_MAGIC):
+    def _write(self, f, rows, compression, alpha):
+        # Header, then every row (RLE groups or packed pixels) behind its
+        # 2-byte length.
+        f.write(self.HEADER_MAGIC)
+        f.write(bytes([self.VERSION]))
+        f.write(bytes([compression]))
+        f.write(bytes([alpha]))
+        f.write(self.width.to_bytes(2, "big"))
+        f.write(self.height.to_bytes(2, "big"))
+
+        for row in rows:
+            f.write(len(row).to_bytes(2, "big"))
+            f.write(row)
+
+    def _read_header(self, f):
+        header = bytes(f.read(10))
+        if not header.startswith(self.HEADER_MAGIC):
             raise ValueError("Not a valid NVGIF file")
-        version = data[3]
-        compression = data[4]
-        alpha = data[5]
-        self.width = int.from_bytes(data[6:8], "big")
-        self.height = int.from_bytes(data[8:10], "big")
+        if len(header) < 10:
+            raise ValueError("Truncated NVGIF header")
+        compression = header[4]
+        alpha = header[5]
+        self.width = int.from_bytes(header[6:8], "big")
+        self.height = int.from_bytes(header[8:10], "big")
+        return compression, alpha
 
+    def _iter_rows(self, f, compression, alpha, stats=None, step=1):
+        # With `step` > 1 only every `step`th row is read, and only every
+        # `step`th pixel of it kept: RLE rows are sampled without expanding
+        # their runs, and the rows in between are seeked over.
         bpp = 4 if alpha == self.ALPHA_ENABLED else 3
-        offset = 10
-        img = Image.new("RGBA", (self.width, self.height))
+        row_size = -(-self.width // step) * bpp
+
+        for y in range(self.height):
+            prefix = f.read(2)
+            if len(prefix) < 2:
+                raise ValueError(f"Row {y}: missing length prefix")
+            row_len = int.from_bytes(prefix, "big")
+            if y % step:
+                f.seek(row_len, 1)
+                continue
+            raw = f.read(row_len)
+            if len(raw) < row_len:
+                raise ValueError(f"Row {y}: truncated row")
+
+            if compression == self.COMPRESSION_RLE:
+                row = rle_decode(raw, bpp) if step == 1 else rle_sample(raw, bpp, step, self.width)
+                if stats is not None:
+                    stats.count_runs((raw,), bpp)
+            elif row_len != self.width * bpp:
+                raise ValueError(f"Row {y} length mismatch: got {row_len} bytes")
+            else:
+                row = sample_pixels(raw, bpp, step)
+            if len(row) != row_size:
+                raise ValueError(f"Row {y} length mismatch: got {len(row)} bytes")
+            yield row
 
+    def _iter_encoded_rows(self, f):
+        # The stored rows as they are, without their length prefixes: RLE
+        # groups or packed pixels, depending on the compression.
         for y in range(self.height):
-            row_len = int.from_bytes(data[offset:offset+2], "big")
-            offset += 2
-            raw = data[offset:offset + row_len]
-            offset += row_len
-
-            row = self._rle_decode(raw, bpp) if compression == self.COMPRESSION_RLE else raw
-            for x in range(self.width):
-                i = x * bpp
-                if bpp == 4:
-                    r, g, b, a = row[i:i+4]
-                else:
-                    r, g, b = row[i:i+3]
-                    a = 255
-                img.putpixel((x, y), (r, g, b, a))
+            prefix = f.read(2)
+            if len(prefix) < 2:
+                raise ValueError(f"Row {y}: missing length prefix")
+            row_len = int.from_bytes(prefix, "big")
+            row = f.read(row_len)
+            if len(row) < row_len:
+                raise ValueError(f"Row {y}: truncated row")
+            yield row
+
+    def iter_rows(self, nvg_path, scale=None):
+        """Yield the RGB/RGBA rows of the NVGIFv3 at `nvg_path` (a path or binary file object), top to bottom."""
+        with input_file(nvg_path) as f:
+            compression, alpha = self._read_header(f)
+            yield from self._iter_rows(f, compression, alpha, step=scale_step(scale))
+
+    def _fill(self, reader, compression, alpha, pixels, step, stats=None):
+        # Rows are memoryview slices of the buffer, copied once into place.
+        bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+        row_size = scaled_size(self.width, self.height, step)[0] * bpp
+        with timed(stats, "rows"):
+            for y, row in enumerate(self._iter_rows(reader, compression, alpha, stats, step)):
+                pixels[y * row_size:(y + 1) * row_size] = row
+
+    def decode_into(self, nvg_path, out, scale=None, stats=None):
+        """Decode the NVGIFv3 at `nvg_path` into `out`, a writable buffer of `height` x `width` x 3 (4 with alpha) bytes.
+
+        See `nvgif_buffer.output_view` for the buffers accepted. Returns `out`.
+        """
+        with open_buffer(nvg_path, stats) as reader:
+            compression, alpha = self._read_header(reader)
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+            self._fill(reader, compression, alpha, output_view(out, (height, width, bpp)), step, stats)
+        return out
+
+    def decode(self, nvg_path, png_path=RETURN_IMAGE, stats=None, scale=None):
+        with open_buffer(nvg_path, stats) as reader:
+            compression, alpha = self._read_header(reader)
+
+            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            pixels = bytearray(width * bpp * height)
+            self._fill(reader, compression, alpha, pixels, step, stats)
+
+        mode = "RGBA" if alpha == self.ALPHA_ENABLED else "RGB"
+        with timed(stats, "image"):
+            img = Image.frombytes(mode, (width, height), pixels).convert("RGBA")
+        if stats is not None:
+            stats.count_frame(width, height, bpp, len(reader), decoding=True)
+
         if png_path != self.RETURN_IMAGE:
-            img.save(png_path)
+            with timed(stats, "save"):
+                img.save(png_path)
         else:
-            return img
-
-    def _rle_encode(self, row, bpp):
-        result = bytearray()
-        i = 0
-        while i < len(row):
-            unit = row[i:i+bpp]
-            count = 1
-            while (i + count * bpp < len(row)) and (count < 255) and (row[i + count * bpp:i + (count+1) * bpp] == unit):
-                count += 1
-            result.append(count)
-            result += unit
-            i += count * bpp
-        return result
-
-    def _rle_decode(self, data, bpp):
-        result = bytearray()
-        i = 0
-        while i < len(data):
-            count = data[i]
-            unit = data[i+1:i+1+bpp]
-            result.extend(unit * count)
-            i += 1 + bpp
-        return result
\ No newline at end of file
+            return img
\ No newline at end of file
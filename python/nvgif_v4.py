@@ -1,5 +1,58 @@
 import zlib
 from PIL import Image
+from nvgif_buffer import BufferReader, input_file, open_buffer, output_view
+from nvgif_pixels import (buffer_rows, expand_palette, palette_buffer, pixel_buffer, sample_pixels, scale_step,
+                          scaled_size)
+from nvgif_rle import rle_decode, rle_encode_rows, rle_sample
+from nvgif_stats import timed
+
+
+class _ZlibReader:
+    """Reads a zlib stream from `f` as if it were the uncompressed data.
+
+    Input is pulled in `chunk_size` pieces and inflated only as far as the
+    caller asks, so at most about one read plus one chunk is held at once.
+    """
+
+    def __init__(self, f, chunk_size, wbits=zlib.MAX_WBITS):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._inflater = zlib.decompressobj(wbits)
+        self._buffer = bytearray()
+
+    def read(self, n):
+        while len(self._buffer) < n and not self._inflater.eof:
+            data = self._inflater.unconsumed_tail or self._f.read(self._chunk_size)
+            if not data:
+                self._buffer += self._inflater.flush()
+                break
+            want = max(n - len(self._buffer), self._chunk_size)
+            self._buffer += self._inflater.decompress(data, want)
+
+        out = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return out
+
+    def readinto(self, b):
+        """Inflate straight into the writable buffer `b` until it is full; returns the bytes written."""
+        view = memoryview(b)
+        filled = min(len(self._buffer), len(view))
+        view[:filled] = self._buffer[:filled]
+        del self._buffer[:filled]
+        while filled < len(view) and not self._inflater.eof:
+            data = self._inflater.unconsumed_tail or self._f.read(self._chunk_size)
+            if not data:
+                self._buffer += self._inflater.flush()
+                take = min(len(self._buffer), len(view) - filled)
+                view[filled:filled + take] = self._buffer[:take]
+                del self._buffer[:take]
+                filled += take
+                break
+            # Bounded output keeps each piece (and the unconsumed tail) small.
+            chunk = self._inflater.decompress(data, min(len(view) - filled, 16 * self._chunk_size))
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+        return filled
 
 
 class NVGIFv4:
@@ -13,158 +66,545 @@ class NVGIFv4:
 
     ALPHA_DISABLED = 0
     ALPHA_ENABLED = 1
+    # Bit in the alpha byte: pixels are one-byte indices into a palette
+    # table that follows the header.
+    ALPHA_PALETTE = 0x02
     
     RETURN_IMAGE = 1
 
+    # Bytes read from disk at a time by the streaming decoder.
+    CHUNK_SIZE = 64 * 1024
+
+    # zlib effort used for the Zlib and RLE+Zlib modes (0-9).
+    DEFAULT_LEVEL = 9
+
+    # Bit in the header's reserved byte: a row offset index footer follows the payload.
+    FLAG_ROW_INDEX = 0x01
+    INDEX_MAGIC = b"NVGI"
+
     def __init__(self):
         self.width = 0
         self.height = 0
+        self.flags = 0
+        # Packed RGB/RGBA palette entries of a palette file, else None.
+        self.palette = None
 
-    def _rle_encode(self, data: bytearray, bpp: int) -> bytearray:
-        encoded = bytearray()
-        i = 0
-        while i < len(data):
-            chunk = data[i:i+bpp]
-            count = 1
-            while (
-                i + bpp * (count + 1) <= len(data)
-                and data[i:i+bpp] == data[i + bpp * count:i + bpp * (count + 1)]
-                and count < 255
-            ):
-                count += 1
-            encoded.append(count)
-            encoded.extend(chunk)
-            i += bpp * count
-        return encoded
-
-    def encode(self, image_or_path, out_path, compression=COMPRESSION_RLE_ZLIB, alpha=ALPHA_DISABLED):
-        if isinstance(image_or_path, Image.Image):
-            img = image_or_path.convert("RGBA")
-        else:
-            img = Image.open(image_or_path).convert("RGBA")
+    def _bpp(self, alpha):
+        # Bytes stored per pixel: a palette index, or RGB/RGBA.
+        if alpha & self.ALPHA_PALETTE:
+            return 1
+        return 4 if alpha & self.ALPHA_ENABLED else 3
+
+    def encode(self, image_or_path, out_path, compression=COMPRESSION_RLE_ZLIB, alpha=ALPHA_DISABLED, workers=None, level=DEFAULT_LEVEL,
+               index_interval=None, stats=None, palette=False):
+        # `palette` False (the default) always stores RGB/RGBA, True requires
+        # a palette and None uses one when the image has at most 256 colours.
+        # Only this decoder reads palette files, so they are opt-in.
+        with timed(stats, "load"):
+            if isinstance(image_or_path, Image.Image):
+                img = image_or_path.convert("RGBA")
+            else:
+                img = Image.open(image_or_path).convert("RGBA")
 
         self.width, self.height = img.size
         bpp = 4 if alpha == self.ALPHA_ENABLED else 3
 
-        raw = bytearray()
-        if compression == self.COMPRESSION_RLE:
-            for y in range(self.height):
-                row = bytearray()
-                for x in range(self.width):
-                    r, g, b, a = img.getpixel((x, y))
-                    row.extend([r, g, b, a] if bpp == 4 else [r, g, b])
-                encoded_row = self._rle_encode(row, bpp)
-                raw.extend(len(encoded_row).to_bytes(2, "big"))
-                raw.extend(encoded_row)
-
-        elif compression == self.COMPRESSION_ZLIB:
-            for y in range(self.height):
-                for x in range(self.width):
-                    r, g, b, a = img.getpixel((x, y))
-                    raw.extend([r, g, b, a] if bpp == 4 else [r, g, b])
-            raw = zlib.compress(raw, level=9)
-        
-        elif compression == self.COMPRESSION_RLE_ZLIB:
-            rle_data = bytearray()
-            for y in range(self.height):
-                row = bytearray()
-                for x in range(self.width):
-                    r, g, b, a = img.getpixel((x, y))
-                    row.extend([r, g, b, a] if bpp == 4 else [r, g, b])
-                encoded_row = self._rle_encode(row, bpp)
-                rle_data.extend(len(encoded_row).to_bytes(2, "big"))
-                rle_data.extend(encoded_row)
-        
-            raw = zlib.compress(rle_data, level=9)
-
-        elif compression == self.COMPRESSION_NONE:
-            for y in range(self.height):
-                row = bytearray()
-                for x in range(self.width):
-                    r, g, b, a = img.getpixel((x, y))
-                    row.extend([r, g, b, a] if bpp == 4 else [r, g, b])
-                raw.extend(len(row).to_bytes(2, "big"))
-                raw.extend(row)
+        table = None
+        with timed(stats, "pixels"):
+            # Empty images have no colours to fill a palette table with.
+            if palette is not False and self.width * self.height:
+                indexed = palette_buffer(img, bpp)
+                if indexed is not None:
+                    table, buf = indexed
+                    bpp = 1
+            if table is None and palette:
+                if not self.width * self.height:
+                    raise ValueError("An empty image cannot be stored with a palette")
+                raise ValueError("Image has more colours than a palette can hold")
+            if table is None:
+                buf = pixel_buffer(img, bpp)
+        with self.open(out_path, self.width, self.height, compression, alpha, level, index_interval, stats,
+                       table) as writer:
+            if workers and compression in (self.COMPRESSION_RLE, self.COMPRESSION_RLE_ZLIB):
+                with timed(stats, "rle"):
+                    rows = rle_encode_rows(buf, self.width, self.height, bpp, workers=workers)
+                if stats is not None:
+                    stats.count_runs(rows, bpp)
+                writer.write_encoded_rows(rows)
+            else:
+                writer.write_rows(buffer_rows(buf, self.width, self.height, bpp))
 
-        else:
-            raise ValueError("Unsupported compression type")
+    def open(self, out_path, width, height, compression=COMPRESSION_RLE_ZLIB, alpha=ALPHA_DISABLED, level=DEFAULT_LEVEL,
+             index_interval=None, stats=None, palette=None):
+        """Start an incremental encode to `out_path` (a path or writable binary file object).
 
-        with open(out_path, "wb") as f:
-            f.write(self.HEADER_MAGIC)
-            f.write(bytes([self.VERSION]))
-            f.write(bytes([compression]))
-            f.write(bytes([alpha]))
-            f.write(self.width.to_bytes(2, "big"))
-            f.write(self.height.to_bytes(2, "big"))
-            f.write(bytes([0]))  # Reserved
-            f.write(raw)
-
-    def _rle_decode(self, data: bytes, bpp: int) -> bytearray:
-        decoded = bytearray()
-        i = 0
-        while i < len(data):
-            count = data[i]
-            i += 1
-            pixel = data[i:i+bpp]
-            decoded.extend(pixel * count)
-            i += bpp
-        return decoded
-
-    def decode(self, nvg_path, png_path=RETURN_IMAGE):
-        with open(nvg_path, "rb") as f:
-            header = f.read(11)
-            if not header.startswith(self.HEADER_MAGIC):
-                raise ValueError("Not a valid NVGIF file")
-
-            version = header[3]
-            if version != self.VERSION:
-                raise ValueError(f"Unsupported NVGIF version: {version}")
-
-            compression = header[4]
-            alpha = header[5]
-            self.width = int.from_bytes(header[6:8], "big")
-            self.height = int.from_bytes(header[8:10], "big")
-            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
-            data = f.read()
-
-        pixels = bytearray()
+        With packed RGB/RGBA `palette` entries, rows are written as one-byte
+        indices into it. Returns the open `NVGIFv4Writer`.
+        """
+        writer = NVGIFv4Writer(out_path, width, height, compression, alpha, level, index_interval, stats, palette)
+        writer.open()
+        return writer
 
-        if compression == self.COMPRESSION_NONE or compression == self.COMPRESSION_RLE:
-            i = 0
-            for _ in range(self.height):
-                row_len = int.from_bytes(data[i:i+2], "big")
-                i += 2
-                row_data = data[i:i+row_len]
-                i += row_len
-
-                if compression == self.COMPRESSION_RLE:
-                    row = self._rle_decode(row_data, bpp)
+    def _read_header(self, f):
+        header = bytes(f.read(11))
+        if not header.startswith(self.HEADER_MAGIC):
+            raise ValueError("Not a valid NVGIF file")
+        if len(header) < 11:
+            raise ValueError("Truncated NVGIF header")
+
+        version = header[3]
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported NVGIF version: {version}")
+
+        compression = header[4]
+        alpha = header[5]
+        self.width = int.from_bytes(header[6:8], "big")
+        self.height = int.from_bytes(header[8:10], "big")
+        self.flags = header[10]
+
+        self.palette = None
+        if alpha & self.ALPHA_PALETTE:
+            # Table: entry count minus one, then the RGB/RGBA entries.
+            count = f.read(1)
+            if not count:
+                raise ValueError("Truncated palette table")
+            size = (count[0] + 1) * (4 if alpha & self.ALPHA_ENABLED else 3)
+            self.palette = bytes(f.read(size))
+            if len(self.palette) < size:
+                raise ValueError("Truncated palette table")
+        return compression, alpha
+
+    def _image(self, pixels, size, alpha, palette=False):
+        # Build the decoded image from stored pixels. Palette files give a
+        # `P` image when `palette` is set and are expanded otherwise.
+        mode = "RGBA" if alpha & self.ALPHA_ENABLED else "RGB"
+        if not alpha & self.ALPHA_PALETTE:
+            return Image.frombytes(mode, size, pixels)
+        count = len(self.palette) // len(mode)
+        if count < 256 and bytes(pixels).translate(None, bytes(range(count))):
+            raise ValueError(f"Palette index past the {count}-colour palette")
+        out = Image.frombytes("P", size, pixels)
+        out.putpalette(self.palette, mode)
+        return out if palette else out.convert(mode)
+
+    def _read_index(self, f):
+        # Footer: offsets (8 bytes each), interval (2), count (4), INDEX_MAGIC.
+        f.seek(-10, 2)
+        tail = f.read(10)
+        if tail[6:] != self.INDEX_MAGIC:
+            raise ValueError("Row index flag is set but the index footer is missing")
+        interval = int.from_bytes(tail[0:2], "big")
+        count = int.from_bytes(tail[2:6], "big")
+        f.seek(-10 - 8 * count, 2)
+        table = f.read(8 * count)
+        offsets = [int.from_bytes(table[i:i+8], "big") for i in range(0, len(table), 8)]
+        return interval, offsets
+
+    def _iter_rows(self, f, compression, alpha, start=0, stop=None, from_row=0, raw_deflate=False, inflated=False,
+                   stats=None, step=1):
+        # `f` is positioned at row `from_row`; rows before `start` are skipped
+        # without being decoded. `raw_deflate` means the payload is read from a
+        # sync-flush point of the zlib stream rather than from its header, and
+        # `inflated` that `f` already holds the decompressed payload. With
+        # `step` > 1 only every `step`th row from `start` is decoded, keeping
+        # every `step`th pixel; RLE rows are sampled without expanding them.
+        bpp = self._bpp(alpha)
+        row_size = self.width * bpp
+        out_size = -(-self.width // step) * bpp
+        stop = self.height if stop is None else stop
+
+        if compression == self.COMPRESSION_NONE or compression == self.COMPRESSION_RLE or inflated:
+            source = f
+        elif compression == self.COMPRESSION_ZLIB or compression == self.COMPRESSION_RLE_ZLIB:
+            source = _ZlibReader(f, self.CHUNK_SIZE, -zlib.MAX_WBITS if raw_deflate else zlib.MAX_WBITS)
+        else:
+            raise ValueError("Unknown compression type")
+
+        for y in range(from_row, stop):
+            keep = y >= start and (y - start) % step == 0
+            if compression == self.COMPRESSION_ZLIB:
+                row = source.read(row_size)
+                if len(row) != row_size:
+                    raise ValueError(f"Row {y} length mismatch: got {len(row)} bytes")
+                if not keep:
+                    continue
+                row = sample_pixels(row, bpp, step)
+            else:
+                prefix = source.read(2)
+                if len(prefix) < 2:
+                    raise ValueError(f"Row {y}: missing length prefix")
+                row_len = int.from_bytes(prefix, "big")
+                if not keep and source is f:
+                    f.seek(row_len, 1)
+                    continue
+                row = source.read(row_len)
+                if len(row) < row_len:
+                    raise ValueError(f"Row {y}: truncated row")
+                if not keep:
+                    continue
+                if compression != self.COMPRESSION_NONE:
+                    if stats is not None:
+                        stats.count_runs((row,), bpp)
+                    row = rle_decode(row, bpp) if step == 1 else rle_sample(row, bpp, step, self.width)
+                elif row_len != row_size:
+                    raise ValueError(f"Row {y} length mismatch: got {row_len} bytes")
                 else:
-                    row = row_data
-
-                pixels.extend(row)
-
-        elif compression == self.COMPRESSION_ZLIB:
-            decompressed = zlib.decompress(data)
-            pixels = decompressed
-        
-        elif compression == self.COMPRESSION_RLE_ZLIB:
-            decompressed = zlib.decompress(data)
-            i = 0
-            for _ in range(self.height):
-                row_len = int.from_bytes(decompressed[i:i+2], "big")
-                i += 2
-                row_data = decompressed[i:i+row_len]
-                i += row_len
-                row = self._rle_decode(row_data, bpp)
-                pixels.extend(row)
+                    row = sample_pixels(row, bpp, step)
+
+            if len(row) != out_size:
+                raise ValueError(f"Row {y} length mismatch: got {len(row)} bytes")
+            yield row
 
+    def _iter_encoded_rows(self, f, compression, alpha):
+        # The stored rows as they are: RLE groups or packed pixels (palette
+        # indices in palette files), inflated but not otherwise decoded.
+        row_size = self.width * self._bpp(alpha)
+        if compression == self.COMPRESSION_NONE or compression == self.COMPRESSION_RLE:
+            source = f
+        elif compression == self.COMPRESSION_ZLIB or compression == self.COMPRESSION_RLE_ZLIB:
+            source = _ZlibReader(f, self.CHUNK_SIZE)
         else:
             raise ValueError("Unknown compression type")
 
-        mode = "RGBA" if alpha == self.ALPHA_ENABLED else "RGB"
-        out = Image.frombytes(mode, (self.width, self.height), bytes(pixels))
+        for y in range(self.height):
+            if compression == self.COMPRESSION_ZLIB:
+                row = source.read(row_size)
+                if len(row) != row_size:
+                    raise ValueError(f"Row {y} length mismatch: got {len(row)} bytes")
+                yield row
+                continue
+            prefix = source.read(2)
+            if len(prefix) < 2:
+                raise ValueError(f"Row {y}: missing length prefix")
+            row_len = int.from_bytes(prefix, "big")
+            row = source.read(row_len)
+            if len(row) < row_len:
+                raise ValueError(f"Row {y}: truncated row")
+            yield row
+
+    def iter_rows(self, nvg_path, scale=None):
+        """Yield the decoded RGB/RGBA rows of the NVGIFv4 at `nvg_path`, top to bottom.
+
+        `nvg_path` may also be a readable binary file object, which is read
+        from its current position and left open. The file is read and
+        inflated in chunks of `CHUNK_SIZE` bytes, so memory use stays around
+        one row plus the zlib window. `width` and `height` are set once
+        iteration starts.
+        """
+        with input_file(nvg_path) as f:
+            compression, alpha = self._read_header(f)
+            rows = self._iter_rows(f, compression, alpha, step=scale_step(scale))
+            if not alpha & self.ALPHA_PALETTE:
+                yield from rows
+                return
+            bpp = 4 if alpha & self.ALPHA_ENABLED else 3
+            for row in rows:
+                yield expand_palette(row, self.palette, bpp)
+
+    def decode_region(self, nvg_path, box):
+        """Decode only the `(left, upper, right, lower)` box of the NVGIFv4 at `nvg_path`.
+
+        If the file has a row index, decoding starts at the indexed row at
+        or above `upper` instead of at the top of the file. Rows below
+        `lower` are never read. Returns a `PIL.Image.Image` of the box.
+        """
+        left, upper, right, lower = box
+        with open_buffer(nvg_path) as f:
+            compression, alpha = self._read_header(f)
+            if not (0 <= left <= right <= self.width and 0 <= upper <= lower <= self.height):
+                raise ValueError(f"Region {box} is outside the {self.width}x{self.height} image")
+
+            from_row = 0
+            raw_deflate = False
+            if self.flags & self.FLAG_ROW_INDEX and upper > 0:
+                interval, offsets = self._read_index(f)
+                entry = min(upper // interval, len(offsets) - 1)
+                f.seek(offsets[entry])
+                from_row = entry * interval
+                raw_deflate = True
+
+            bpp = self._bpp(alpha)
+            pixels = bytearray()
+            for row in self._iter_rows(f, compression, alpha, upper, lower, from_row, raw_deflate):
+                pixels += row[left * bpp:right * bpp]
+        return self._image(pixels, (right - left, lower - upper), alpha)
+
+    def _decode_pixels(self, reader, compression, alpha, stats=None, step=1, out=None):
+        # Whole-image decode of an in-memory file, keeping every `step`th row
+        # and column. Raw rows are copied from memoryview slices straight
+        # into the output buffer: `out` if given, else a new one.
+        width, height = scaled_size(self.width, self.height, step)
+        row_size = width * self._bpp(alpha)
+        if out is not None and compression == self.COMPRESSION_ZLIB and step == 1:
+            # Inflate a chunk at a time straight into `out`.
+            with timed(stats, "zlib"):
+                filled = _ZlibReader(reader, self.CHUNK_SIZE).readinto(out)
+            if filled < row_size * height:
+                raise ValueError(f"Zlib payload too short: got {filled} bytes")
+            return out
+
+        compression_zlib = compression == self.COMPRESSION_ZLIB or compression == self.COMPRESSION_RLE_ZLIB
+        if compression_zlib:
+            # A decompressobj leaves truncation to the row checks below,
+            # matching the streaming decoder's errors.
+            with timed(stats, "zlib"):
+                reader = BufferReader(zlib.decompressobj().decompress(reader.read()))
+
+        if compression == self.COMPRESSION_ZLIB and step == 1:
+            pixels = reader.read()
+            if len(pixels) < row_size * self.height:
+                raise ValueError(f"Zlib payload too short: got {len(pixels)} bytes")
+            return pixels
+
+        pixels = bytearray(row_size * height) if out is None else out
+        with timed(stats, "rows"):
+            rows = self._iter_rows(reader, compression, alpha, inflated=compression_zlib, stats=stats, step=step)
+            for y, row in enumerate(rows):
+                pixels[y * row_size:(y + 1) * row_size] = row
+        return pixels
+
+    def decode_into(self, nvg_path, out, scale=None, stats=None):
+        """Decode the NVGIFv4 at `nvg_path` into `out`, a writable buffer of `height` x `width` x 3 (4 with alpha) bytes.
+
+        Palette files are expanded through their palette. See
+        `nvgif_buffer.output_view` for the buffers accepted. Returns `out`.
+        """
+        with open_buffer(nvg_path, stats) as reader:
+            compression, alpha = self._read_header(reader)
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            bpp = 4 if alpha & self.ALPHA_ENABLED else 3
+            view = output_view(out, (height, width, bpp))
+            if alpha & self.ALPHA_PALETTE:
+                indices = memoryview(self._decode_pixels(reader, compression, alpha, stats, step))[:width * height]
+                with timed(stats, "palette"):
+                    expand_palette(indices, self.palette, bpp, view)
+            else:
+                self._decode_pixels(reader, compression, alpha, stats, step, view)
+        return out
+
+    def decode(self, nvg_path, png_path=RETURN_IMAGE, stats=None, scale=None, palette=False):
+        """Decode the NVGIFv4 at `nvg_path` into an image at `png_path`, or return it.
+
+        Palette files are expanded to RGB/RGBA unless `palette` is set, in
+        which case they are returned as `P` images carrying the palette.
+        """
+        with open_buffer(nvg_path, stats) as reader:
+            compression, alpha = self._read_header(reader)
+            step = scale_step(scale)
+            pixels = self._decode_pixels(reader, compression, alpha, stats, step)
+
+        size = scaled_size(self.width, self.height, step)
+        with timed(stats, "image"):
+            out = self._image(pixels, size, alpha, palette)
+        if stats is not None:
+            stats.count_frame(*size, 4 if alpha & self.ALPHA_ENABLED else 3, len(reader), decoding=True)
+
         if png_path == self.RETURN_IMAGE:
             return out
         else:
-            out.save(png_path)
\ No newline at end of file
+            with timed(stats, "save"):
+                out.save(png_path)
+
+
+class NVGIFv4Writer:
+    """Encodes an NVGIFv4 one batch of rows at a time.
+
+    Rows are RLE-encoded and fed through a `zlib.compressobj` as they
+    arrive and written straight to the file, so memory use does not grow
+    with the image height. The output is byte-identical to
+    `NVGIFv4.encode` for the same pixels.
+
+    With `index_interval` set, the offset of every `index_interval`-th row
+    is recorded (after a zlib full flush in the Zlib modes) and written as a
+    footer, which `NVGIFv4.decode_region` uses to seek.
+
+    `out_path` may be a writable binary file object instead of a path; it
+    does not need to be seekable and is left open by `close`. With a
+    `nvgif_stats.Stats` as `stats`, RLE, zlib and write time and the frame
+    counters are recorded into it.
+    """
+
+    # Rows RLE-encoded together in one vectorized pass.
+    BATCH_ROWS = 64
+
+    def __init__(self, out_path, width, height, compression=NVGIFv4.COMPRESSION_RLE_ZLIB, alpha=NVGIFv4.ALPHA_DISABLED,
+                 level=NVGIFv4.DEFAULT_LEVEL, index_interval=None, stats=None, palette=None):
+        if compression not in (
+            NVGIFv4.COMPRESSION_NONE,
+            NVGIFv4.COMPRESSION_RLE,
+            NVGIFv4.COMPRESSION_ZLIB,
+            NVGIFv4.COMPRESSION_RLE_ZLIB,
+        ):
+            raise ValueError("Unsupported compression type")
+        if index_interval is not None and not 0 < index_interval < 65536:
+            raise ValueError("index_interval must be between 1 and 65535 rows")
+        channels = 4 if alpha == NVGIFv4.ALPHA_ENABLED else 3
+        if palette is not None and not (0 < len(palette) <= 256 * channels and len(palette) % channels == 0):
+            raise ValueError(f"palette must hold 1 to 256 entries of {channels} bytes")
+
+        self.out_path = out_path
+        self.width = width
+        self.height = height
+        self.compression = compression
+        self.alpha = alpha
+        self.level = level
+        self.index_interval = index_interval
+        self.stats = stats
+        self.index = []
+        self.palette = palette
+        self.channels = channels
+        self.bpp = 1 if palette is not None else channels
+        self.rows_written = 0
+        self.bytes_written = 0
+        self._f = None
+        self._owns_file = False
+        self._compressor = None
+
+    def open(self):
+        self._owns_file = not hasattr(self.out_path, "write")
+        self._f = open(self.out_path, "wb") if self._owns_file else self.out_path
+        self._write(NVGIFv4.HEADER_MAGIC)
+        self._write(bytes([NVGIFv4.VERSION]))
+        self._write(bytes([self.compression]))
+        self._write(bytes([self.alpha | NVGIFv4.ALPHA_PALETTE if self.palette is not None else self.alpha]))
+        self._write(self.width.to_bytes(2, "big"))
+        self._write(self.height.to_bytes(2, "big"))
+        self._write(bytes([NVGIFv4.FLAG_ROW_INDEX if self.index_interval else 0]))
+        if self.palette is not None:
+            self._write(bytes([len(self.palette) // self.channels - 1]))
+            self._write(bytes(self.palette))
+
+        if self.compression in (NVGIFv4.COMPRESSION_ZLIB, NVGIFv4.COMPRESSION_RLE_ZLIB):
+            self._compressor = zlib.compressobj(self.level)
+        return self
+
+    def write_rows(self, rows):
+        """Append packed RGB/RGBA `rows` (any iterable of bytes-like rows) to the image.
+
+        With a `palette`, each row holds one palette index byte per pixel.
+        """
+        if self._f is None:
+            raise ValueError("Writer is not open")
+
+        row_size = self.width * self.bpp
+        batch = []
+        for row in rows:
+            if len(row) != row_size:
+                raise ValueError(f"Row {self.rows_written + len(batch)} length mismatch: got {len(row)} bytes, expected {row_size}")
+            if self.rows_written + len(batch) >= self.height:
+                raise ValueError(f"Too many rows: image height is {self.height}")
+            batch.append(row)
+            if len(batch) == self.BATCH_ROWS:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+
+    def write_encoded_rows(self, rows):
+        """Append rows that are already in this file's row encoding.
+
+        For RLE and RLE+Zlib that is the `[count][pixel]` groups of each
+        row, for None and Zlib the packed pixels. Rows are written without
+        being re-encoded.
+        """
+        if self._f is None:
+            raise ValueError("Writer is not open")
+
+        batch = []
+        for row in rows:
+            if self.rows_written + len(batch) >= self.height:
+                raise ValueError(f"Too many rows: image height is {self.height}")
+            batch.append(row)
+            if len(batch) == self.BATCH_ROWS:
+                self._write_encoded(batch)
+                batch = []
+        if batch:
+            self._write_encoded(batch)
+
+    def _write_batch(self, batch):
+        if self.compression in (NVGIFv4.COMPRESSION_RLE, NVGIFv4.COMPRESSION_RLE_ZLIB):
+            with timed(self.stats, "rle"):
+                batch = rle_encode_rows(b"".join(batch), self.width, len(batch), self.bpp)
+            if self.stats is not None:
+                self.stats.count_runs(batch, self.bpp)
+        self._write_encoded(batch)
+
+    def _write_encoded(self, batch):
+        if not self.index_interval:
+            self._write_payload(batch)
+            return
+
+        # Split the batch so every indexed row starts a new payload write.
+        start = 0
+        while start < len(batch):
+            into_interval = self.rows_written % self.index_interval
+            if into_interval == 0:
+                self._mark_index()
+            end = min(len(batch), start + self.index_interval - into_interval)
+            self._write_payload(batch[start:end])
+            start = end
+
+    def _mark_index(self):
+        if self._compressor is not None:
+            # A full flush resets the deflate state, so inflation can restart here.
+            with timed(self.stats, "zlib"):
+                flushed = self._compressor.flush(zlib.Z_FULL_FLUSH)
+            self._write(flushed)
+        # Offsets count from the start of the image, not of the file object.
+        self.index.append(self.bytes_written)
+
+    def _write_payload(self, batch):
+        if self.compression == NVGIFv4.COMPRESSION_ZLIB:
+            payload = b"".join(batch)
+        else:
+            payload = bytearray()
+            for row in batch:
+                payload += len(row).to_bytes(2, "big")
+                payload += row
+
+        if self._compressor is not None:
+            with timed(self.stats, "zlib"):
+                payload = self._compressor.compress(payload)
+        self._write(payload)
+        self.rows_written += len(batch)
+
+    def _write(self, data):
+        with timed(self.stats, "write"):
+            self._f.write(data)
+        self.bytes_written += len(data)
+
+    def _release(self):
+        if self._owns_file:
+            self._f.close()
+        self._f = None
+
+    def close(self):
+        if self._f is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Expected {self.height} rows, got {self.rows_written}")
+            if self._compressor is not None:
+                with timed(self.stats, "zlib"):
+                    flushed = self._compressor.flush()
+                self._write(flushed)
+            if self.index_interval:
+                for offset in self.index:
+                    self._write(offset.to_bytes(8, "big"))
+                self._write(self.index_interval.to_bytes(2, "big"))
+                self._write(len(self.index).to_bytes(4, "big"))
+                self._write(NVGIFv4.INDEX_MAGIC)
+            if self.stats is not None:
+                self.stats.count_frame(self.width, self.height, self.channels, self.bytes_written)
+        finally:
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._f is not None:
+            self._release()
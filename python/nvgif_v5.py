@@ -0,0 +1,368 @@
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from nvgif_buffer import input_file, open_buffer, output_file, output_view
+from nvgif_pixels import pixel_buffer, sample_pixels, scale_step, scaled_size
+from nvgif_rle import rle_decode, rle_encode_rows
+from nvgif_stats import timed
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the stdlib path is used instead
+    np = None
+
+
+class NVGIFv5:
+    """Tiled NVGIF for large images.
+
+    Dimensions are 32-bit, and the image is cut into tiles that are each
+    compressed on their own and listed in an offset table after the
+    header. Tiles are encoded and decoded on a thread pool (zlib and
+    NumPy release the GIL), and any one tile can be read without
+    touching the rest of the file.
+    """
+
+    VERSION = 5
+    HEADER_MAGIC = b"NVG"
+    HEADER_SIZE = 19
+
+    COMPRESSION_NONE = 0
+    COMPRESSION_RLE = 1
+    COMPRESSION_ZLIB = 2
+    COMPRESSION_RLE_ZLIB = 3
+
+    ALPHA_DISABLED = 0
+    ALPHA_ENABLED = 1
+
+    RETURN_IMAGE = 1
+
+    # zlib effort used for the Zlib and RLE+Zlib modes (0-9).
+    DEFAULT_LEVEL = 9
+
+    # Tile width and height; each is stored in 16 bits.
+    DEFAULT_TILE_SIZE = (256, 256)
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.tile_width = 0
+        self.tile_height = 0
+        self.flags = 0
+
+    @property
+    def tile_grid(self):
+        """`(columns, rows)` of tiles in the current image."""
+        if not self.tile_width or not self.tile_height:
+            return 0, 0
+        return -(-self.width // self.tile_width), -(-self.height // self.tile_height)
+
+    def tile_box(self, column, row):
+        """Return the `(left, upper, right, lower)` pixel box of a tile; edge tiles are cut short."""
+        left, upper = column * self.tile_width, row * self.tile_height
+        return left, upper, min(left + self.tile_width, self.width), min(upper + self.tile_height, self.height)
+
+    def encode(self, image_or_path, out_path, compression=COMPRESSION_RLE_ZLIB, alpha=ALPHA_DISABLED, workers=None,
+               level=DEFAULT_LEVEL, tile_size=DEFAULT_TILE_SIZE, stats=None):
+        with timed(stats, "load"):
+            if isinstance(image_or_path, Image.Image):
+                img = image_or_path.convert("RGBA")
+            else:
+                img = Image.open(image_or_path).convert("RGBA")
+
+        tile_width, tile_height = tile_size or self.DEFAULT_TILE_SIZE
+        if not (0 < tile_width < 65536 and 0 < tile_height < 65536):
+            raise ValueError(f"Tile size {tile_width}x{tile_height} is out of range (1-65535)")
+        if compression not in (self.COMPRESSION_NONE, self.COMPRESSION_RLE, self.COMPRESSION_ZLIB,
+                               self.COMPRESSION_RLE_ZLIB):
+            raise ValueError("Unknown compression type")
+        self.width, self.height = img.size
+        self.tile_width, self.tile_height = tile_width, tile_height
+        bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+
+        with timed(stats, "pixels"):
+            buf = pixel_buffer(img, bpp)
+        columns, rows = self.tile_grid
+        boxes = [self.tile_box(column, row) for row in range(rows) for column in range(columns)]
+        with timed(stats, "tiles"), ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+            tiles = list(pool.map(lambda box: self._encode_tile(buf, box, bpp, compression, level), boxes))
+
+        # Offsets of every tile plus the end of the last one, from the start of the file.
+        offset = self.HEADER_SIZE + 8 * (len(tiles) + 1)
+        table = bytearray()
+        for tile in tiles:
+            table += offset.to_bytes(8, "big")
+            offset += len(tile)
+        table += offset.to_bytes(8, "big")
+
+        with output_file(out_path) as f, timed(stats, "write"):
+            f.write(self.HEADER_MAGIC)
+            f.write(bytes([self.VERSION, compression, alpha]))
+            f.write(self.width.to_bytes(4, "big"))
+            f.write(self.height.to_bytes(4, "big"))
+            f.write(tile_width.to_bytes(2, "big"))
+            f.write(tile_height.to_bytes(2, "big"))
+            f.write(b"\x00")  # flags, reserved
+            f.write(table)
+            for tile in tiles:
+                f.write(tile)
+
+        if stats is not None:
+            stats.count_frame(self.width, self.height, bpp, offset)
+
+    def _encode_tile(self, buf, box, bpp, compression, level):
+        left, upper, right, lower = box
+        width, height = right - left, lower - upper
+        if np is not None:
+            frame = np.frombuffer(buf, dtype=np.uint8).reshape(self.height, self.width, bpp)
+            pixels = frame[upper:lower, left:right].tobytes()
+        else:
+            view = memoryview(buf)
+            row_len = self.width * bpp
+            pixels = b"".join(view[y * row_len + left * bpp:y * row_len + right * bpp] for y in range(upper, lower))
+
+        # Runs never cross tile rows, so a tile's RLE groups expand straight
+        # back into its pixels without per-row length prefixes.
+        if compression == self.COMPRESSION_RLE or compression == self.COMPRESSION_RLE_ZLIB:
+            pixels = b"".join(rle_encode_rows(pixels, width, height, bpp))
+        if compression == self.COMPRESSION_ZLIB or compression == self.COMPRESSION_RLE_ZLIB:
+            pixels = zlib.compress(pixels, level)
+        return pixels
+
+    def _read_header(self, f):
+        header = bytes(f.read(self.HEADER_SIZE))
+        if not header.startswith(self.HEADER_MAGIC):
+            raise ValueError("Not a valid NVGIF file")
+        if len(header) < self.HEADER_SIZE:
+            raise ValueError("Truncated NVGIF header")
+
+        version = header[3]
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported NVGIF version: {version}")
+
+        compression = header[4]
+        alpha = header[5]
+        self.width = int.from_bytes(header[6:10], "big")
+        self.height = int.from_bytes(header[10:14], "big")
+        self.tile_width = int.from_bytes(header[14:16], "big")
+        self.tile_height = int.from_bytes(header[16:18], "big")
+        self.flags = header[18]
+        if not self.tile_width or not self.tile_height:
+            raise ValueError("Tile size must not be zero")
+        return compression, alpha
+
+    def _read_table(self, f):
+        # Read right after the header: one offset per tile, then the end offset.
+        columns, rows = self.tile_grid
+        count = columns * rows + 1
+        table = f.read(8 * count)
+        if len(table) < 8 * count:
+            raise ValueError("Truncated tile table")
+        return [int.from_bytes(table[i:i + 8], "big") for i in range(0, len(table), 8)]
+
+    def _decode_tile(self, data, compression, bpp, box):
+        left, upper, right, lower = box
+        size = (right - left) * (lower - upper) * bpp
+        if compression == self.COMPRESSION_ZLIB or compression == self.COMPRESSION_RLE_ZLIB:
+            try:
+                data = zlib.decompress(data)
+            except zlib.error as e:
+                raise ValueError(f"Tile at {box[:2]}: {e}") from None
+        elif compression != self.COMPRESSION_NONE and compression != self.COMPRESSION_RLE:
+            raise ValueError("Unknown compression type")
+        if compression == self.COMPRESSION_RLE or compression == self.COMPRESSION_RLE_ZLIB:
+            data = rle_decode(data, bpp)
+        if len(data) != size:
+            raise ValueError(f"Tile at {box[:2]} length mismatch: got {len(data)} bytes, expected {size}")
+        return data
+
+    def _place(self, out, out_width, pixels, box, bpp, origin=(0, 0), step=1):
+        # Copy every `step`th row and column of a decoded tile into `out`, a
+        # frame `out_width` pixels wide whose top left is image pixel
+        # `origin`. Sampling is aligned to the whole image, not to the tile.
+        left, upper, right, lower = box
+        width = right - left
+        dx, dy = -left % step, -upper % step
+        x = -(-left // step) - -(-origin[0] // step)
+        y = -(-upper // step) - -(-origin[1] // step)
+        if np is not None:
+            tile = np.frombuffer(pixels, dtype=np.uint8).reshape(lower - upper, width, bpp)[dy::step, dx::step]
+            frame = np.frombuffer(out, dtype=np.uint8).reshape(-1, out_width, bpp)
+            frame[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+            return
+        row_len = width * bpp
+        view = memoryview(pixels)
+        for ty in range(dy, lower - upper, step):
+            row = sample_pixels(view[ty * row_len + dx * bpp:(ty + 1) * row_len], bpp, step)
+            start = (y * out_width + x) * bpp
+            out[start:start + len(row)] = row
+            y += 1
+
+    def _decode_tiles(self, data, offsets, indices, compression, alpha, out, out_width, origin=(0, 0), step=1,
+                      workers=None):
+        # Decode the tiles numbered `indices` of the file held in `data` and
+        # place them into `out`. `data` is a memoryview, so every thread
+        # slices its tile out without a shared read position.
+        bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+        columns, _ = self.tile_grid
+
+        def work(index):
+            start, end = offsets[index], offsets[index + 1]
+            if not 0 <= start <= end <= len(data):
+                raise ValueError(f"Tile {index}: offsets {start}-{end} are outside the file")
+            box = self.tile_box(index % columns, index // columns)
+            pixels = self._decode_tile(data[start:end], compression, bpp, box)
+            self._place(out, out_width, pixels, box, bpp, origin, step)
+
+        if len(indices) <= 1 or workers == 1:
+            for index in indices:
+                work(index)
+            return
+        with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+            list(pool.map(work, indices))
+
+    def decode_tile(self, nvg_path, column, row):
+        """Decode the single tile at `column`, `row` of the NVGIFv5 at `nvg_path`.
+
+        Only the header, two entries of the tile table and the tile itself
+        are read. Returns a `PIL.Image.Image` of the tile.
+        """
+        with open_buffer(nvg_path) as reader:
+            compression, alpha = self._read_header(reader)
+            columns, rows = self.tile_grid
+            if not (0 <= column < columns and 0 <= row < rows):
+                raise ValueError(f"Tile ({column}, {row}) is outside the {columns}x{rows} tile grid")
+            index = row * columns + column
+            reader.seek(self.HEADER_SIZE + 8 * index)
+            entry = reader.read(16)
+            if len(entry) < 16:
+                raise ValueError("Truncated tile table")
+            offsets = {index: int.from_bytes(entry[:8], "big"), index + 1: int.from_bytes(entry[8:], "big")}
+
+            box = self.tile_box(column, row)
+            width, height = box[2] - box[0], box[3] - box[1]
+            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+            pixels = bytearray(width * height * bpp)
+            reader.seek(0)
+            self._decode_tiles(reader.read(), offsets, [index], compression, alpha, pixels, width, box[:2])
+        return Image.frombytes("RGBA" if alpha == self.ALPHA_ENABLED else "RGB", (width, height), pixels)
+
+    def decode_region(self, nvg_path, box):
+        """Decode only the `(left, upper, right, lower)` box of the NVGIFv5 at `nvg_path`.
+
+        Only the tiles that overlap the box are read and decoded.
+        """
+        left, upper, right, lower = box
+        with open_buffer(nvg_path) as reader:
+            compression, alpha = self._read_header(reader)
+            if not (0 <= left <= right <= self.width and 0 <= upper <= lower <= self.height):
+                raise ValueError(f"Region {box} is outside the {self.width}x{self.height} image")
+            offsets = self._read_table(reader)
+
+            # The overlapping tiles are decoded into a frame aligned to the tile
+            # grid, which is then cropped to the box.
+            columns, _ = self.tile_grid
+            first_column, end_column = left // self.tile_width, -(-right // self.tile_width)
+            first_row, end_row = upper // self.tile_height, -(-lower // self.tile_height)
+            indices = [row * columns + column for row in range(first_row, end_row)
+                       for column in range(first_column, end_column)]
+            frame_left, frame_upper = first_column * self.tile_width, first_row * self.tile_height
+            frame_width = max(0, min(end_column * self.tile_width, self.width) - frame_left)
+            frame_height = max(0, min(end_row * self.tile_height, self.height) - frame_upper)
+
+            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+            frame = bytearray(frame_width * frame_height * bpp)
+            reader.seek(0)
+            self._decode_tiles(reader.read(), offsets, indices, compression, alpha, frame, frame_width,
+                               (frame_left, frame_upper))
+        mode = "RGBA" if alpha == self.ALPHA_ENABLED else "RGB"
+        image = Image.frombytes(mode, (frame_width, frame_height), frame)
+        return image.crop((left - frame_left, upper - frame_upper, right - frame_left, lower - frame_upper))
+
+    def _iter_rows(self, f, compression, alpha, stats=None, step=1, workers=None):
+        # `f` is positioned right after the header. Tiles are stored row by
+        # row, so each band of tiles is read in turn and decoded in parallel.
+        bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+        offsets = self._read_table(f)
+        columns, rows = self.tile_grid
+        out_width = -(-self.width // step)
+        row_size = out_width * bpp
+        position = self.HEADER_SIZE + 8 * len(offsets)
+        for row in range(rows):
+            first, end = row * columns, (row + 1) * columns
+            # The band's tiles as one contiguous read, indexed from the file start.
+            if offsets[first] < position:
+                raise ValueError(f"Tile {first}: offset {offsets[first]} overlaps the tile table")
+            f.read(offsets[first] - position)
+            chunk = f.read(offsets[end] - offsets[first])
+            if len(chunk) < offsets[end] - offsets[first]:
+                raise ValueError(f"Tile row {row}: truncated")
+            position = offsets[end]
+            upper, lower = row * self.tile_height, min((row + 1) * self.tile_height, self.height)
+            band_rows = -(-lower // step) - -(-upper // step)
+            if not band_rows:
+                continue
+            band = {i: offsets[i] - offsets[first] for i in range(first, end + 1)}
+            pixels = bytearray(row_size * band_rows)
+            with timed(stats, "tiles"):
+                self._decode_tiles(memoryview(chunk), band, range(first, end), compression, alpha, pixels, out_width,
+                                   (0, upper), step, workers)
+            for y in range(band_rows):
+                yield pixels[y * row_size:(y + 1) * row_size]
+
+    def iter_rows(self, nvg_path, scale=None):
+        """Yield the decoded RGB/RGBA rows of the NVGIFv5 at `nvg_path`, top to bottom.
+
+        One band of tiles is read and decoded at a time, so memory use stays
+        around one tile row. `nvg_path` may also be a readable binary file
+        object; it need not be seekable.
+        """
+        with input_file(nvg_path) as f:
+            compression, alpha = self._read_header(f)
+            yield from self._iter_rows(f, compression, alpha, step=scale_step(scale))
+
+    def decode_into(self, nvg_path, out, scale=None, stats=None, workers=None):
+        """Decode the NVGIFv5 at `nvg_path` into `out`, a writable buffer of `height` x `width` x 3 (4 with alpha) bytes.
+
+        Tiles are placed straight into `out`. See `nvgif_buffer.output_view`
+        for the buffers accepted. Returns `out`.
+        """
+        with open_buffer(nvg_path, stats) as reader:
+            compression, alpha = self._read_header(reader)
+            offsets = self._read_table(reader)
+
+            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+            step = scale_step(scale)
+            width, height = scaled_size(self.width, self.height, step)
+            view = output_view(out, (height, width, bpp))
+            reader.seek(0)
+            with timed(stats, "tiles"):
+                self._decode_tiles(reader.read(), offsets, range(len(offsets) - 1), compression, alpha, view, width,
+                                   step=step, workers=workers)
+        return out
+
+    def decode(self, nvg_path, png_path=RETURN_IMAGE, stats=None, scale=None, workers=None):
+        with open_buffer(nvg_path, stats) as reader:
+            compression, alpha = self._read_header(reader)
+            offsets = self._read_table(reader)
+
+            bpp = 4 if alpha == self.ALPHA_ENABLED else 3
+            step = scale_step(scale)
+            size = scaled_size(self.width, self.height, step)
+            pixels = bytearray(size[0] * size[1] * bpp)
+            reader.seek(0)
+            with timed(stats, "tiles"):
+                self._decode_tiles(reader.read(), offsets, range(len(offsets) - 1), compression, alpha, pixels, size[0],
+                                   step=step, workers=workers)
+
+        mode = "RGBA" if alpha == self.ALPHA_ENABLED else "RGB"
+        with timed(stats, "image"):
+            out = Image.frombytes(mode, size, pixels)
+        if stats is not None:
+            stats.count_frame(*size, bpp, len(reader), decoding=True)
+
+        if png_path == self.RETURN_IMAGE:
+            return out
+        else:
+            with timed(stats, "save"):
+                out.save(png_path)
@@ -0,0 +1,33 @@
+from PIL import Image
+
+from nvgif import NVGIF
+from nvgif_auto import pick_compression
+
+
+def _stripes():
+    img = Image.new("RGB", (96, 80), (250, 250, 250))
+    for y in range(0, 80, 5):
+        img.paste((30, 60, 90) if y % 10 else (200, 20, 20), (0, y, 96, y + 2))
+    return img
+
+
+def _estimate(choice, compression):
+    return next(e.size for e in choice.estimates if e.compression == compression)
+
+
+def test_v4_estimates_sample_palette_indices():
+    img = _stripes()
+    actual = len(NVGIF().encode_bytes(img, version=4, compression="none", palette=True))
+
+    estimate = _estimate(pick_compression(img, 4, palette=True), "none")
+
+    assert abs(estimate - actual) < actual * 0.05
+
+
+def test_v4_estimates_without_palette_sample_rgb():
+    img = _stripes()
+    actual = len(NVGIF().encode_bytes(img, version=4, compression="none"))
+
+    estimate = _estimate(pick_compression(img, 4), "none")
+
+    assert abs(estimate - actual) < actual * 0.05
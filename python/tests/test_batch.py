@@ -0,0 +1,80 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+import nvgif_batch
+from nvgif_batch import run_batch
+
+
+def test_same_stem_in_two_directories_is_reported_not_overwritten(tmp_path):
+    for name, colour in (("c1", (255, 0, 0)), ("c2", (0, 0, 255))):
+        os.mkdir(tmp_path / name)
+        Image.new("RGB", (4, 4), colour).save(tmp_path / name / "x.png")
+    out = tmp_path / "out"
+
+    result = run_batch("encode", [str(tmp_path / "c1"), str(tmp_path / "c2")], str(out), jobs=1)
+
+    assert result.converted == 0
+    assert sorted(src for src, _ in result.failures) == [str(tmp_path / "c1" / "x.png"), str(tmp_path / "c2" / "x.png")]
+    assert not os.path.exists(out / "x.nvg")
+
+
+def test_distinct_stems_are_converted(tmp_path):
+    Image.new("RGB", (4, 4), (1, 2, 3)).save(tmp_path / "a.png")
+    Image.new("RGB", (4, 4), (4, 5, 6)).save(tmp_path / "b.png")
+    out = tmp_path / "out"
+
+    result = run_batch("encode", [str(tmp_path)], str(out), jobs=1)
+
+    assert result.converted == 2
+    assert result.failures == []
+    assert sorted(os.listdir(out)) == ["a.nvg", "b.nvg"]
+
+
+class _FailingNVGIF:
+    def encode(self, src, dst, **options):
+        with open(dst, "wb") as f:
+            f.write(b"NVG")
+        raise ValueError("disk full")
+
+
+def test_failed_conversion_leaves_the_old_output(tmp_path, monkeypatch):
+    Image.new("RGB", (4, 4)).save(tmp_path / "a.png")
+    (tmp_path / "a.nvg").write_bytes(b"old")
+    monkeypatch.setattr(nvgif_batch, "_nvgif", _FailingNVGIF())
+
+    src, _, error = nvgif_batch._convert_one(("encode", str(tmp_path / "a.png"), str(tmp_path / "a.nvg"), {}))
+
+    assert error == "ValueError: disk full"
+    assert (tmp_path / "a.nvg").read_bytes() == b"old"
+    assert sorted(os.listdir(tmp_path)) == ["a.nvg", "a.png"]
+
+
+class _BreakingPool:
+    # Yields the first result, then fails like a pool whose worker died.
+    def __init__(self, max_workers):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, fn, tasks, chunksize=1):
+        tasks = list(tasks)
+        yield fn(tasks[0])
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+
+def test_broken_pool_reports_the_remaining_files(tmp_path, monkeypatch):
+    for name in ("a", "b", "c"):
+        Image.new("RGB", (4, 4)).save(tmp_path / f"{name}.png")
+    monkeypatch.setattr(nvgif_batch, "ProcessPoolExecutor", _BreakingPool)
+
+    result = run_batch("encode", [str(tmp_path)], str(tmp_path / "out"), jobs=1)
+
+    assert result.converted == 1
+    assert [src for src, _ in result.failures] == [str(tmp_path / "b.png"), str(tmp_path / "c.png")]
+    assert all(error.startswith("BrokenProcessPool") for _, error in result.failures)
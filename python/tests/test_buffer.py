@@ -0,0 +1,47 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from nvgif import NVGIF
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc/self/maps")
+
+CALLS = {
+    "decode": lambda nv, path: nv.decode(path),
+    "decode_into": lambda nv, path: nv.decode_into(path, bytearray(6 * 5 * 3)),
+    "decode_region": lambda nv, path: nv.decode_region(path, (1, 1, 4, 3)),
+    "transcode": lambda nv, path: nv.transcode(path, io.BytesIO(), version=4, compression="rle"),
+}
+
+
+def _mapped(path):
+    with open("/proc/self/maps") as f:
+        return any(line.rstrip("\n").endswith(path) for line in f)
+
+
+@pytest.mark.parametrize("version", [1, 2, 3, 4, 5])
+@pytest.mark.parametrize("call", sorted(CALLS))
+def test_decoding_a_path_unmaps_the_file(tmp_path, version, call):
+    nv = NVGIF()
+    path = str(tmp_path / f"a.nvg{version}")
+    nv.encode(Image.new("RGB", (6, 5), (9, 8, 7)), path, version=version)
+
+    CALLS[call](nv, path)
+
+    assert not _mapped(path)
+
+
+@pytest.mark.parametrize("version", [1, 2, 3, 4, 5])
+def test_failed_decode_unmaps_the_file(tmp_path, version):
+    nv = NVGIF()
+    path = str(tmp_path / f"a.nvg{version}")
+    nv.encode(Image.new("RGB", (6, 5), (9, 8, 7)), path, version=version)
+
+    # The traceback keeps the decoder's frames, and their reader, alive.
+    with pytest.raises(ValueError) as excinfo:
+        nv.decode_region(path, (0, 0, 7, 5))
+
+    assert excinfo.traceback
+    assert not _mapped(path)
@@ -0,0 +1,21 @@
+import io
+
+import pytest
+from PIL import Image
+
+from nvgif import NVGIF
+
+
+@pytest.mark.parametrize("version", [1, 2, 3, 4, 5])
+def test_truncated_header_raises_value_error(tmp_path, version):
+    nv = NVGIF()
+    encoded = io.BytesIO()
+    nv.encode(Image.new("RGB", (3, 2)), encoded, version=version)
+    path = tmp_path / "truncated.nvg"
+
+    for length in range(3, NVGIF.HEADER_SIZES[version]):
+        path.write_bytes(encoded.getvalue()[:length])
+        with pytest.raises(ValueError):
+            nv.decode(str(path))
+        with pytest.raises(ValueError):
+            nv.probe(str(path))
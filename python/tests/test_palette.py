@@ -0,0 +1,51 @@
+import io
+
+import pytest
+from PIL import Image
+
+from nvgif import NVGIF
+
+
+@pytest.mark.parametrize("size", [(0, 5), (5, 0), (0, 0)])
+def test_empty_image_is_stored_without_a_palette(size):
+    nv = NVGIF()
+    encoded = nv.encode_bytes(Image.new("RGB", size), version=4, palette=None)
+
+    assert nv.probe(io.BytesIO(encoded)).palette == 0
+    assert nv.decode_bytes(encoded).size == size
+
+
+def test_empty_image_with_required_palette_raises():
+    with pytest.raises(ValueError):
+        NVGIF().encode_bytes(Image.new("RGB", (0, 5)), version=4, palette=True)
+
+
+def test_few_colours_are_stored_as_a_palette_when_asked():
+    nv = NVGIF()
+    img = Image.new("RGB", (7, 3), (10, 20, 30))
+    img.putpixel((2, 1), (200, 100, 0))
+    encoded = nv.encode_bytes(img, version=4, palette=None)
+
+    assert nv.probe(io.BytesIO(encoded)).palette == 2
+    assert nv.decode_bytes(encoded).tobytes() == img.tobytes()
+
+
+def test_palette_is_off_by_default():
+    # Other NVGIF decoders read the alpha byte as a plain flag.
+    img = Image.new("RGB", (7, 3), (10, 20, 30))
+    encoded = NVGIF().encode_bytes(img, version=4)
+
+    assert encoded[5] == 0
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_palette_indices_match_the_pixels(mode):
+    # Colours that differ in a single channel, and in alpha only for RGBA.
+    nv = NVGIF()
+    img = Image.new(mode, (128, 2))
+    img.putdata([(x * 2, 0, 0, 255) for x in range(128)]
+                + [(40, 120, 200, x * 2) if mode == "RGBA" else (0, 0, x * 2 + 1, 255) for x in range(128)])
+    alpha = 1 if mode == "RGBA" else 0
+    encoded = nv.encode_bytes(img, version=4, alpha=alpha, palette=True)
+
+    assert nv.decode_bytes(encoded).tobytes() == img.tobytes()
@@ -0,0 +1,55 @@
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import nvgif_scan
+from nvgif import NVGIF
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    root = tmp_path / "archive"
+    root.mkdir()
+    NVGIF().encode(Image.new("RGB", (3, 2), (1, 2, 3)), str(root / "a.nvg"))
+    return root
+
+
+def test_default_cache_is_kept_outside_the_scanned_directory(archive):
+    cache = nvgif_scan.default_cache_path(str(archive))
+
+    first = nvgif_scan.run_scan(str(archive), io.StringIO(), cache_path=cache)
+    second = nvgif_scan.run_scan(str(archive), io.StringIO(), cache_path=cache)
+
+    assert os.listdir(archive) == ["a.nvg"]
+    assert (first.cached, second.cached) == (0, 1)
+
+
+def test_unwritable_cache_warns_and_keeps_the_results(archive, tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    out = io.StringIO()
+
+    with pytest.warns(RuntimeWarning, match="scan cache"):
+        result = nvgif_scan.run_scan(str(archive), out, cache_path=str(blocker / "cache.json"))
+
+    assert result.files == 1
+    assert len(out.getvalue().splitlines()) == 1
+
+
+def test_cache_with_other_fields_is_ignored(archive, tmp_path):
+    cache = tmp_path / "cache.json"
+    st = os.stat(archive / "a.nvg")
+    # An entry as written before records had the `palette` column.
+    record = {"path": str(archive / "a.nvg"), "version": 4, "error": None}
+    cache.write_text(json.dumps({"entries": {str(archive / "a.nvg"): [st.st_mtime_ns, st.st_size, record]}}))
+    out = io.StringIO()
+
+    result = nvgif_scan.run_scan(str(archive), out, cache_path=str(cache))
+
+    assert result.cached == 0
+    assert json.loads(out.getvalue())["palette"] == 0
+    assert nvgif_scan.run_scan(str(archive), io.StringIO(), cache_path=str(cache)).cached == 1
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from nvgif import NVGIF
+from nvgif_cache import DecodeCache
+
+SIZES = [(30, 20), (17, 41), (64, 9), (5, 5)]
+
+
+@pytest.fixture
+def files(tmp_path):
+    nv = NVGIF()
+    paths = {}
+    for i, size in enumerate(SIZES):
+        img = Image.new("RGB", size)
+        img.putdata([((x * 7 + i) % 256, (x * 3) % 256, (x * 11) % 256) for x in range(size[0] * size[1])])
+        path = str(tmp_path / f"{i}.nvg")
+        nv.encode(img, path, version=4)
+        paths[path] = img
+    return paths
+
+
+@pytest.mark.parametrize("cache", [None, DecodeCache()])
+def test_shared_nvgif_decodes_concurrently(files, cache):
+    nv = NVGIF(cache=cache)
+    jobs = list(files) * 100
+
+    def decode(path):
+        if cache is not None:
+            cache.clear()
+        return path, nv.decode(path).tobytes(), bytes(nv.decode_into(path, bytearray(len(files[path].tobytes()))))
+
+    with ThreadPoolExecutor(8) as pool:
+        for path, pixels, into in pool.map(decode, jobs):
+            assert pixels == files[path].tobytes()
+            assert into == pixels
+
+
+def test_shared_nvgif_regions_and_rows_concurrently(files):
+    nv = NVGIF()
+    jobs = list(files) * 50
+
+    def decode(path):
+        width, height = files[path].size
+        region = nv.decode_region(path, (1, 1, width, height)).convert("RGB").tobytes()
+        rows = b"".join(nv.iter_rows(path))
+        return path, region, rows
+
+    with ThreadPoolExecutor(8) as pool:
+        for path, region, rows in pool.map(decode, jobs):
+            width, height = files[path].size
+            assert region == files[path].crop((1, 1, width, height)).tobytes()
+            assert rows == files[path].tobytes()
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+from PIL import Image
+
+from nvgif import NVGIF
+
+# (version, compression, alpha, palette) of the source files.
+SOURCES = [(2, "rle", 0, False), (3, "none", 1, False), (4, "rlezlib", 1, False), (4, "rle", 0, True),
+           (4, "zlib", 1, True), (5, "zlib", 1, False)]
+TARGETS = [(1, None), (2, "rle"), (3, "none"), (3, "rle"), (4, "none"), (4, "rle"), (4, "rlezlib"), (5, "rle")]
+
+
+def _image(alpha, palette):
+    img = Image.new("RGBA", (23, 9))
+    if palette:
+        img.putdata([((x // 5) * 60, y * 20, 7, 255 - (x // 5) * 50 * alpha) for y in range(9) for x in range(23)])
+    else:
+        img.putdata([(x * 11 % 256, (x // 3) * 9, y * 25, (x * y * 13) % 256 if alpha else 255)
+                     for y in range(9) for x in range(23)])
+    return img if alpha else img.convert("RGB")
+
+
+@pytest.mark.parametrize("version, compression", TARGETS)
+@pytest.mark.parametrize("src_version, src_compression, alpha, palette", SOURCES)
+def test_transcode_keeps_the_pixels(src_version, src_compression, alpha, palette, version, compression):
+    nv = NVGIF()
+    img = _image(alpha, palette)
+    src = nv.encode_bytes(img, version=src_version, compression=src_compression, alpha=alpha, palette=palette)
+    out = io.BytesIO()
+
+    nv.transcode(io.BytesIO(src), out, version=version, compression=compression)
+
+    expected = img if version >= 3 else img.convert("RGB")
+    assert nv.probe(io.BytesIO(out.getvalue())).version == version
+    assert nv.decode_bytes(out.getvalue()).convert("RGBA").tobytes() == expected.convert("RGBA").tobytes()
+
+
+@pytest.mark.parametrize("src_version, src_compression, compression", [(3, "rle", "rle"), (4, "rle", "rlezlib"),
+                                                                        (4, "rlezlib", "none"), (2, "none", "zlib")])
+@pytest.mark.parametrize("palette", [False, True])
+def test_copied_rows_match_a_direct_encode(src_version, src_compression, compression, palette):
+    nv = NVGIF()
+    img = _image(0, palette)
+    src = nv.encode_bytes(img, version=src_version, compression=src_compression, palette=palette)
+    out = io.BytesIO()
+
+    nv.transcode(io.BytesIO(src), out, version=4, compression=compression)
+
+    # Palette files stay palette files only when the source is a v4 palette file.
+    direct = nv.encode_bytes(img, version=4, compression=compression, palette=palette and src_version == 4)
+    assert out.getvalue() == direct
+
+
+def test_transcode_onto_itself_raises(tmp_path):
+    path = str(tmp_path / "a.nvg")
+    NVGIF().encode(_image(0, False), path)
+
+    with pytest.raises(ValueError):
+        NVGIF().transcode(path, path)
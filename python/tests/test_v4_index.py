@@ -0,0 +1,69 @@
+import io
+
+import pytest
+from PIL import Image
+
+from nvgif import NVGIF
+from nvgif_v4 import NVGIFv4
+
+COMPRESSIONS = [NVGIFv4.COMPRESSION_NONE, NVGIFv4.COMPRESSION_RLE, NVGIFv4.COMPRESSION_ZLIB,
+                NVGIFv4.COMPRESSION_RLE_ZLIB]
+
+
+def _image(size, mode="RGB"):
+    width, height = size
+    img = Image.new(mode, size)
+    img.putdata([((x // 4 * 30) % 256, (y * 7) % 256, (x ^ y) % 256, (x + y) % 256)[:len(mode)]
+                 for y in range(height) for x in range(width)])
+    return img
+
+
+def _encode(img, **options):
+    out = io.BytesIO()
+    NVGIFv4().encode(img, out, **options)
+    return out.getvalue()
+
+
+def _every(img, step):
+    # Every `step`th row and column, starting with the first, like a scaled decode.
+    bpp = len(img.mode)
+    data = img.tobytes()
+    rows = [data[y * img.width * bpp:(y + 1) * img.width * bpp] for y in range(0, img.height, step)]
+    pixels = b"".join(row[x:x + bpp] for row in rows for x in range(0, len(row), bpp * step))
+    return Image.frombytes(img.mode, (-(-img.width // step), len(rows)), pixels)
+
+
+@pytest.fixture(params=COMPRESSIONS)
+def pair(request):
+    # The same image with and without a row index, plus the source.
+    img = _image((29, 53), "RGBA")
+    options = {"compression": request.param, "alpha": NVGIFv4.ALPHA_ENABLED}
+    return _encode(img, index_interval=8, **options), _encode(img, **options), img
+
+
+def test_indexed_and_plain_files_decode_alike(pair):
+    indexed, plain, img = pair
+    nv = NVGIF()
+
+    assert nv.probe(io.BytesIO(indexed)).indexed
+    assert not nv.probe(io.BytesIO(plain)).indexed
+    assert NVGIFv4().decode(io.BytesIO(indexed)).tobytes() == NVGIFv4().decode(io.BytesIO(plain)).tobytes() \
+        == img.tobytes()
+
+
+@pytest.mark.parametrize("box", [(0, 0, 29, 53), (3, 8, 20, 9), (0, 17, 29, 40), (5, 52, 6, 53), (2, 30, 2, 30)])
+def test_region_matches_a_full_decode(pair, box):
+    indexed, plain, img = pair
+    full = NVGIFv4().decode(io.BytesIO(plain))
+
+    assert NVGIFv4().decode_region(io.BytesIO(indexed), box).tobytes() == full.crop(box).tobytes()
+    assert NVGIFv4().decode_region(io.BytesIO(plain), box).tobytes() == full.crop(box).tobytes()
+
+
+@pytest.mark.parametrize("scale", [1 / 2, 1 / 3, 1 / 8])
+def test_scaled_decode_matches_a_full_decode(pair, scale):
+    indexed, plain, img = pair
+    expected = _every(NVGIFv4().decode(io.BytesIO(plain)), round(1 / scale)).tobytes()
+
+    assert NVGIFv4().decode(io.BytesIO(indexed), scale=scale).tobytes() == expected
+    assert NVGIFv4().decode(io.BytesIO(plain), scale=scale).tobytes() == expected
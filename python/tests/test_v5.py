@@ -0,0 +1,97 @@
+import io
+
+import pytest
+from PIL import Image
+
+from nvgif import NVGIF
+from nvgif_v5 import NVGIFv5
+
+COMPRESSIONS = [NVGIFv5.COMPRESSION_NONE, NVGIFv5.COMPRESSION_RLE, NVGIFv5.COMPRESSION_ZLIB,
+                NVGIFv5.COMPRESSION_RLE_ZLIB]
+
+
+def _image(size, mode="RGB"):
+    # Short runs mixed with noise, so RLE sees both.
+    width, height = size
+    img = Image.new(mode, size)
+    img.putdata([((x // 3 * 40) % 256, (y * 13) % 256, (x * y) % 256, (x + y * 5) % 256)[:len(mode)]
+                 for y in range(height) for x in range(width)])
+    return img
+
+
+def _encode(img, **options):
+    out = io.BytesIO()
+    NVGIFv5().encode(img, out, **options)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("size, tile_size", [((37, 23), (8, 8)), ((5, 64), (16, 7)), ((1, 1), (4, 4)),
+                                             ((20, 20), (20, 20))])
+def test_odd_sizes_round_trip(size, tile_size, compression):
+    img = _image(size)
+    data = _encode(img, compression=compression, tile_size=tile_size)
+
+    assert NVGIFv5().decode(io.BytesIO(data)).tobytes() == img.tobytes()
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_alpha_round_trips(compression):
+    img = _image((19, 11), "RGBA")
+    data = _encode(img, compression=compression, alpha=NVGIFv5.ALPHA_ENABLED, tile_size=(6, 4))
+
+    out = NVGIFv5().decode(io.BytesIO(data))
+
+    assert out.mode == "RGBA"
+    assert out.tobytes() == img.tobytes()
+
+
+def test_decode_tile_matches_the_full_image():
+    img = _image((37, 23), "RGBA")
+    data = _encode(img, alpha=NVGIFv5.ALPHA_ENABLED, tile_size=(8, 8))
+    nv = NVGIFv5()
+    nv.decode(io.BytesIO(data))
+    columns, rows = nv.tile_grid
+
+    for row in range(rows):
+        for column in range(columns):
+            tile = NVGIFv5().decode_tile(io.BytesIO(data), column, row)
+            assert tile.tobytes() == img.crop(nv.tile_box(column, row)).tobytes()
+    with pytest.raises(ValueError):
+        NVGIFv5().decode_tile(io.BytesIO(data), columns, 0)
+
+
+@pytest.mark.parametrize("box", [(0, 0, 37, 23), (3, 5, 20, 17), (8, 8, 16, 16), (36, 22, 37, 23), (4, 4, 4, 9)])
+def test_decode_region_matches_a_crop(box):
+    img = _image((37, 23))
+    data = _encode(img, tile_size=(8, 8))
+
+    assert NVGIFv5().decode_region(io.BytesIO(data), box).tobytes() == img.crop(box).tobytes()
+
+
+def test_region_outside_the_image_raises():
+    data = _encode(_image((10, 10)), tile_size=(4, 4))
+
+    with pytest.raises(ValueError):
+        NVGIFv5().decode_region(io.BytesIO(data), (0, 0, 11, 10))
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_workers_do_not_change_the_output(compression):
+    img = _image((70, 45), "RGBA")
+    options = {"compression": compression, "alpha": NVGIFv5.ALPHA_ENABLED, "tile_size": (16, 8)}
+    data = _encode(img, workers=1, **options)
+
+    assert _encode(img, workers=4, **options) == data
+    single = NVGIFv5().decode(io.BytesIO(data), workers=1).tobytes()
+    assert NVGIFv5().decode(io.BytesIO(data), workers=4).tobytes() == single == img.tobytes()
+
+
+def test_palette_is_v4_only():
+    # v5 has no palette table; asking for one stores plain pixels.
+    nv = NVGIF()
+    img = Image.new("RGB", (9, 9), (10, 20, 30))
+    data = nv.encode_bytes(img, version=5, palette=None)
+
+    assert nv.probe(io.BytesIO(data)).palette == 0
+    assert nv.decode_bytes(data).tobytes() == img.tobytes()